@@ -1,7 +1,7 @@
 # -*- mode: python ; coding: utf-8 -*-
 from PyInstaller.utils.hooks import collect_all
 
-datas = []
+datas = [('main_folder\\english_vocab.txt.gz', '.')]
 binaries = []
 hiddenimports = []
 tmp_ret = collect_all('manga_ocr')
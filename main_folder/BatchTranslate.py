@@ -0,0 +1,212 @@
+"""
+Offline translation of whole chapters.
+
+    python BatchTranslate.py PAGES OUT_DIR [--workers N] [--render]
+
+PAGES is a directory of images or a CBZ/ZIP archive. Every page goes
+through the live pipeline's OCRWorker (detect -> crop -> OCR) in a pool of
+worker processes; the lines are translated in batches across pages with
+TranslateWorker and its translation memory (shared with the live app), so
+a line repeated on several pages, or translated before, is sent once. Each
+page gets OUT_DIR/<page>.json with its boxes, JP and EN lines, and with
+--render an overlay image with the English drawn over the text.
+
+Workers load pages themselves (only names cross the process boundary) and
+at most `2 * workers` pages are in flight, so memory stays flat however
+long the chapter is. The CPU is split between workers instead of every
+worker's torch/ONNX Runtime using all cores, which is what lets
+throughput grow with the number of workers.
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import time
+import zipfile
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import cv2
+import numpy as np
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp", ".bmp")
+
+# Per-worker-process state
+_worker = None
+_results = {}
+_archives = {}
+
+
+def list_pages(source):
+    if zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as z:
+            names = [n for n in z.namelist() if n.lower().endswith(IMAGE_EXTENSIONS)]
+    else:
+        names = [n for n in os.listdir(source) if n.lower().endswith(IMAGE_EXTENSIONS)]
+    return sorted(names)
+
+
+def load_page(source, name):
+    if os.path.isdir(source):
+        return cv2.imread(os.path.join(source, name), cv2.IMREAD_COLOR)
+    archive = _archives.get(source)
+    if archive is None:
+        archive = _archives[source] = zipfile.ZipFile(source)
+    data = np.frombuffer(archive.read(name), dtype=np.uint8)
+    return cv2.imdecode(data, cv2.IMREAD_COLOR)
+
+
+def _init_worker(threads, quiet, worker_options):
+    # One slice of the CPU per worker; must be set before torch/onnxruntime load
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    if quiet:
+        sys.stdout = open(os.devnull, "w")
+    import torch
+    torch.set_num_threads(threads)
+
+    global _worker
+    from OCRWorker import OCRWorker
+    from ReplayHarness import HeadlessSelector
+    _worker = OCRWorker(HeadlessSelector(), onnx_threads=threads, verbose=not quiet, **worker_options)
+    _worker.mini_coords.connect(lambda coords: _results.__setitem__("coords", coords))
+    _worker.result_ready.connect(lambda texts: _results.__setitem__("texts", texts))
+    _worker.engine.wait_ready()
+
+
+def _ocr_page(source, name):
+    start = time.perf_counter()
+    image = load_page(source, name)
+    if image is None:
+        return name, None, [], [], time.perf_counter() - start
+    h, w = image.shape[:2]
+    _worker.selector.bbox = (0, 0, w, h)
+    # Pages are unrelated: detect everything, but keep the OCR cache (SFX and names repeat)
+    _worker.tile_detector.reset()
+    _worker.scroll_tracker.reset()
+    _worker.process_frame(image, time.time())
+    coords = [list(map(int, c)) for c in _results["coords"]]
+    return name, (h, w), coords, list(_results["texts"]), time.perf_counter() - start
+
+
+def render_overlay(image, lines, font=cv2.FONT_HERSHEY_SIMPLEX):
+    """Draw each line's English over its box: white fill, word-wrapped, shrunk until it fits."""
+    out = image.copy()
+    for line in lines:
+        x, y, w, h = line["box"]
+        cv2.rectangle(out, (x, y), (x + w, y + h), (255, 255, 255), cv2.FILLED)
+        # Manga text is usually vertical; wrap in the box's width either way
+        for scale in np.arange(0.8, 0.19, -0.05):
+            rows = _wrap(line["en"], w, font, scale)
+            row_h = cv2.getTextSize("Ag", font, scale, 1)[0][1] + 4
+            if row_h * len(rows) <= h:
+                break
+        for i, row in enumerate(rows):
+            cv2.putText(out, row, (x + 1, y + (i + 1) * row_h - 2), font, scale, (0, 0, 0), 1, cv2.LINE_AA)
+    return out
+
+
+def _wrap(text, width, font, scale):
+    rows, row = [], ""
+    for word in text.split():
+        candidate = f"{row} {word}".strip()
+        if row and cv2.getTextSize(candidate, font, scale, 1)[0][0] > width:
+            rows.append(row)
+            row = word
+        else:
+            row = candidate
+    return rows + [row] if row else rows
+
+
+def translate_chapter(source, out_dir, workers=None, render=False, batch_lines=40, quiet=True,
+                      memory_path="translation_memory.sqlite3", **worker_options):
+    names = list_pages(source)
+    workers = workers or max(1, min(len(names), os.cpu_count() // 2))
+    threads = max(1, os.cpu_count() // workers)
+    os.makedirs(out_dir, exist_ok=True)
+    print(f"[Batch] {len(names)} pages, {workers} workers x {threads} threads")
+
+    from TranslateWorker import TranslateWorker
+    translator = TranslateWorker(memory_path=memory_path)
+    known = {}    # JP -> EN for the whole chapter
+    waiting = []  # OCR'd pages whose lines aren't all translated yet
+    stats = {"pages": 0, "lines": 0, "ocr_s": 0.0}
+
+    def flush(final=False):
+        # Translate once enough new lines have piled up, then write every page that is complete
+        new = list(dict.fromkeys(jp for page in waiting for jp in page[3] if jp not in known))
+        if new and len(new) < batch_lines and not final:
+            return
+        for i in range(0, len(new), batch_lines):
+            chunk = new[i:i + batch_lines]
+            known.update(zip(chunk, translator.translate_with_memory(chunk)))
+        for name, shape, coords, texts in waiting:
+            write_page(name, shape, coords, texts)
+        waiting.clear()
+
+    def write_page(name, shape, coords, texts):
+        lines = [{"box": box, "jp": jp, "en": known.get(jp, "")} for box, jp in zip(coords, texts)]
+        stem = os.path.splitext(name.replace("/", "_"))[0]
+        with io.open(os.path.join(out_dir, stem + ".json"), "w", encoding="utf-8") as f:
+            json.dump({"page": name, "size": shape, "lines": lines}, f, ensure_ascii=False, indent=2)
+        if render and shape is not None:
+            cv2.imwrite(os.path.join(out_dir, stem + ".png"), render_overlay(load_page(source, name), lines))
+        stats["pages"] += 1
+        stats["lines"] += len(lines)
+
+    start = time.perf_counter()
+    executor = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=mp.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(threads, quiet, worker_options),
+    )
+    pending = set()
+    todo = iter(names)
+    try:
+        while True:
+            # Keep a bounded number of pages in flight
+            for name in todo:
+                pending.add(executor.submit(_ocr_page, source, name))
+                if len(pending) >= 2 * workers:
+                    break
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, shape, coords, texts, seconds = future.result()
+                stats["ocr_s"] += seconds
+                if shape is None:
+                    print(f"[Batch] Could not read {name}, skipping")
+                    continue
+                waiting.append((name, shape, coords, texts))
+            flush()
+        flush(final=True)
+    finally:
+        executor.shutdown(cancel_futures=True)
+        translator.backend.close()
+        translator.memory.close()
+
+    wall = time.perf_counter() - start
+    print("[TranslationMemory]", translator.memory.summary())
+    print(f"[Batch] {stats['pages']} pages, {stats['lines']} lines "
+          f"in {wall:.1f}s | {stats['pages'] / wall:.2f} pages/s, "
+          f"{stats['ocr_s'] / stats['pages'] if stats['pages'] else 0:.2f}s OCR per page "
+          f"| {stats['ocr_s'] / (wall * workers):.0%} worker utilization")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("source", help="directory of page images, or a CBZ/ZIP archive")
+    parser.add_argument("out_dir")
+    parser.add_argument("--workers", type=int, default=None, help="OCR processes (default: half the cores)")
+    parser.add_argument("--render", action="store_true", help="also write overlay images with the English")
+    parser.add_argument("--batch-lines", type=int, default=40, help="lines per translation request")
+    parser.add_argument("--memory", default="translation_memory.sqlite3", help="translation memory database")
+    parser.add_argument("--detector", choices=["torch", "onnx"], default="torch")
+    parser.add_argument("--verbose", action="store_true", help="keep the workers' pipeline logging")
+    args = parser.parse_args()
+
+    translate_chapter(args.source, args.out_dir, workers=args.workers, render=args.render,
+                      batch_lines=args.batch_lines, quiet=not args.verbose, memory_path=args.memory,
+                      detector=args.detector)
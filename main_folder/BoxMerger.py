@@ -0,0 +1,129 @@
+import numpy as np
+
+
+def polygons_to_boxes(polys):
+    """Convert CRAFT 4-point polygons to an (n, 4) int array of [x1, y1, x2, y2]."""
+    if len(polys) == 0:
+        return np.empty((0, 4), dtype=np.int32)
+    pts = np.asarray(polys, dtype=np.float64).reshape(len(polys), -1, 2)
+    return np.concatenate([pts.min(axis=1), pts.max(axis=1)], axis=1).astype(np.int32)
+
+
+def merge_boxes(boxes, x_thresh, y_thresh):
+    """
+    Merge boxes that lie within x_thresh / y_thresh of each other, transitively.
+
+    Two boxes are close when their gaps are at most x_thresh horizontally and
+    y_thresh vertically (the same test the old greedy merge used against
+    group bounds). Close boxes are joined with union-find, and the merge is
+    repeated on the resulting group bounds until it stops shrinking. The
+    result does not depend on input order and is sorted top-to-bottom,
+    left-to-right.
+    """
+    b = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+    while len(b):
+        merged = _merge_pass(b, x_thresh, y_thresh)
+        if len(merged) == len(b):
+            break
+        b = merged
+    order = np.lexsort((b[:, 0], b[:, 1]))
+    return b[order].tolist()
+
+
+def _merge_pass(b, x_thresh, y_thresh):
+    # Sweep line over x: after sorting by x1, a box can only be close to the
+    # boxes that start before its right edge + x_thresh
+    s = b[np.argsort(b[:, 0], kind="stable")]
+    reach = np.searchsorted(s[:, 0], s[:, 2] + x_thresh, side="right")
+
+    parent = list(range(len(s)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i in range(len(s)):
+        hi = reach[i]
+        if hi <= i + 1:
+            continue
+        cand = s[i + 1:hi]
+        close = (cand[:, 1] <= s[i, 3] + y_thresh) & (cand[:, 3] >= s[i, 1] - y_thresh)
+        ri = find(i)
+        for j in np.flatnonzero(close) + i + 1:
+            rj = find(j)
+            if rj != ri:
+                parent[rj] = ri
+
+    roots = np.array([find(i) for i in range(len(s))])
+    _, group = np.unique(roots, return_inverse=True)
+    n_groups = group.max() + 1
+    out = np.empty((n_groups, 4), dtype=np.int64)
+    out[:, :2] = np.iinfo(np.int64).max
+    out[:, 2:] = np.iinfo(np.int64).min
+    np.minimum.at(out[:, 0], group, s[:, 0])
+    np.minimum.at(out[:, 1], group, s[:, 1])
+    np.maximum.at(out[:, 2], group, s[:, 2])
+    np.maximum.at(out[:, 3], group, s[:, 3])
+    return out
+
+
+def _greedy_merge(boxes, x_thresh, y_thresh):
+    # The original OCRWorker merge, kept for the benchmark below
+    def boxes_are_close(a, b):
+        return not (
+            b[2] < a[0] - x_thresh or
+            b[0] > a[2] + x_thresh or
+            b[3] < a[1] - y_thresh or
+            b[1] > a[3] + y_thresh
+        )
+
+    group_bounds = []
+    for box in boxes:
+        for i, bound in enumerate(group_bounds):
+            if boxes_are_close(box, bound):
+                group_bounds[i] = [min(bound[0], box[0]), min(bound[1], box[1]),
+                                   max(bound[2], box[2]), max(bound[3], box[3])]
+                break
+        else:
+            group_bounds.append(list(box))
+    return group_bounds
+
+
+def _synthetic_boxes(n, rng):
+    # Speech bubbles on a grid, each holding a few vertical text columns a
+    # few px apart, like CRAFT output on a dense manga page
+    per_bubble = 5
+    n_bubbles = max(1, n // per_bubble)
+    cols = int(np.ceil(np.sqrt(n_bubbles)))
+    boxes = []
+    for k in range(n):
+        bubble = k % n_bubbles
+        bx, by = (bubble % cols) * 200, (bubble // cols) * 260
+        col = k // n_bubbles
+        x1 = bx + col * 30 + int(rng.integers(0, 4))
+        y1 = by + int(rng.integers(0, 20))
+        boxes.append([x1, y1, x1 + int(rng.integers(20, 26)), y1 + int(rng.integers(40, 200))])
+    return boxes
+
+
+if __name__ == "__main__":
+    import time
+
+    rng = np.random.default_rng(0)
+    print(f"{'boxes':>6} {'greedy ms':>10} {'merged ms':>10} {'groups (greedy/new)':>20} order-independent")
+    for n in (10, 50, 100, 500, 1000, 2000, 5000):
+        boxes = _synthetic_boxes(n, rng)
+
+        start = time.perf_counter()
+        greedy = _greedy_merge(boxes, 10, 1)
+        greedy_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        merged = merge_boxes(boxes, 10, 1)
+        merged_ms = (time.perf_counter() - start) * 1000
+
+        shuffled = [boxes[i] for i in rng.permutation(n)]
+        stable = merge_boxes(shuffled, 10, 1) == merged
+        print(f"{n:>6} {greedy_ms:>10.2f} {merged_ms:>10.2f} {len(greedy):>9}/{len(merged):<10} {stable}")
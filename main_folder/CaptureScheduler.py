@@ -0,0 +1,60 @@
+class CaptureScheduler:
+    """
+    Picks the delay before the next capture.
+
+    A changed frame drops the interval straight to `min_interval` so scrolling
+    or typing text is followed closely. Every unchanged frame multiplies it by
+    `backoff`, up to `max_interval`, so an idle screen is polled less and less.
+    Frames are only captured while fewer than `max_in_flight` are being
+    processed; otherwise the tick is skipped instead of producing work nobody
+    can take yet. A frame still waiting in the mailbox doesn't count: the next
+    capture replaces it, so skipping that capture would only let it go stale.
+    """
+
+    def __init__(self, min_interval=100, max_interval=1000, backoff=1.5, max_in_flight=2, verbose=False):
+        self.min_interval = min_interval  # milliseconds
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.max_in_flight = max_in_flight
+        self.verbose = verbose
+
+        self.interval = min_interval
+        self.in_flight = 0
+        self.state = None
+        self.stats = {"changed": 0, "idle": 0, "throttled": 0}
+
+    def delay(self):
+        return int(self.interval)
+
+    def can_submit(self, in_flight):
+        """`in_flight` is the number of frames being processed, not waiting ones."""
+        self.in_flight = in_flight
+        busy = in_flight >= self.max_in_flight
+        if busy:
+            self.stats["throttled"] += 1
+            self._set_state("throttled")
+        return not busy
+
+    def on_frame(self, changed):
+        if changed:
+            self.stats["changed"] += 1
+            self.interval = self.min_interval
+            self._set_state("active")
+        else:
+            self.stats["idle"] += 1
+            self.interval = min(self.max_interval, self.interval * self.backoff)
+            self._set_state("idle")
+
+    def summary(self):
+        s = self.stats
+        return (
+            f"{self.state} @ {self.delay()}ms | processing {self.in_flight}/{self.max_in_flight} "
+            f"| changed={s['changed']} idle={s['idle']} throttled={s['throttled']}"
+        )
+
+    def _set_state(self, state):
+        # Only log transitions, the per-tick counters are in summary()
+        if state != self.state:
+            self.state = state
+            if self.verbose:
+                print("[Scheduler]", self.summary())
@@ -1,6 +1,9 @@
-from PyQt5.QtCore import pyqtSlot
+from PyQt5.QtCore import pyqtSlot, QTimer
+from PyQt5.QtGui import QFontDatabase
 from PyQt5.QtWidgets import QWidget, QLabel, QTextEdit, QVBoxLayout, QHBoxLayout, QPushButton, QFrame
 from ScreenSelector import ScreenSelector
+from collections import OrderedDict
+import Metrics
 
 import ctypes
 import ctypes.wintypes
@@ -25,19 +28,31 @@ class ControlBox(QWidget):
         self.btn1 = QPushButton("Toggle Capture Box")
         self.btn2 = QPushButton("Toggle Display Box")
         self.btn3 = QPushButton("Force Translate")
+        self.btn4 = QPushButton("Metrics")
 
         # Apply uniform font size to buttons
         button_style = "font-size: 10pt;"
-        for btn in (self.btn1, self.btn2, self.btn3):
+        for btn in (self.btn1, self.btn2, self.btn3, self.btn4):
             btn.setStyleSheet(button_style)
 
         # Add buttons to layout
         header_layout.addWidget(self.btn1)
         header_layout.addWidget(self.btn2)
         header_layout.addWidget(self.btn3)
+        header_layout.addWidget(self.btn4)
         header_layout.addStretch()
         main_layout.addLayout(header_layout)
 
+        # Live per-stage latency panel, hidden until the Metrics button is pressed
+        self.metrics = QLabel()
+        self.metrics.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+        self.metrics.setStyleSheet("font-size: 8pt;")
+        self.metrics.hide()
+        main_layout.addWidget(self.metrics)
+        self.btn4.clicked.connect(self.toggle_metrics)
+        self.metrics_timer = QTimer(self)
+        self.metrics_timer.timeout.connect(self.refresh_metrics)
+
         # Translation history text area (borderless)
         self.text = QTextEdit()
         self.text.setReadOnly(True)
@@ -53,19 +68,34 @@ class ControlBox(QWidget):
         )
         self.text.setViewportMargins(0, 0, 0, 0)
         main_layout.addWidget(self.text)
+        self.logged = OrderedDict()  # line ID -> EN of the lines in the history
 
         hwnd = int(self.winId())
         exclude_window_from_capture(hwnd)
 
-    @pyqtSlot(list, list)
-    def show_translations(self, jp_list, en_list):
-        # Only add a blank line if there is already something in the box
-        if self.text.toPlainText():
-            self.text.append("")   
+    def toggle_metrics(self):
+        if self.metrics.isVisible():
+            self.metrics.hide()
+            self.metrics_timer.stop()
+        else:
+            self.refresh_metrics()
+            self.metrics.show()
+            self.metrics_timer.start(1000)
+
+    def refresh_metrics(self):
+        self.metrics.setText(Metrics.REGISTRY.panel_text())
+
+    @pyqtSlot(str, str, str)
+    def show_translation(self, line_id, jp, en):
+        # Lines arrive one at a time; one still on screen comes back with every frame, log it once
+        if self.logged.get(line_id) == en:
+            return
+        self.logged[line_id] = en
+        while len(self.logged) > 256:
+            self.logged.popitem(last=False)
 
-        for jp, en in zip(jp_list, en_list):
-            self.text.append(jp)
-            self.text.append("→ " + en)
+        self.text.append(jp)
+        self.text.append("→ " + en)
 
         # Scroll to bottom
         self.text.moveCursor(self.text.textCursor().End)
@@ -0,0 +1,197 @@
+import threading
+import cv2
+import numpy as np
+
+
+class DirtyTileDetector:
+    """
+    Incremental text detection over a tile grid.
+
+    Each frame is diffed tile by tile against the previous one. Only the
+    changed tiles (plus a margin) are sent to the detector; boxes from
+    unchanged areas are carried over. A changed area swallows every old box it
+    touches, so a text line is always re-detected whole and never split
+    between carried and fresh boxes.
+
+    `detector` is a MultiScaleDetector. The scale is picked once per frame
+    and every region is detected at that same scale, so a small region is
+    not blown up to full size.
+    """
+
+    def __init__(self, detector, tile_size=64, margin=32,
+                 pixel_threshold=24, min_changed_pixels=4, full_frame_ratio=0.6):
+        self.detector = detector
+        self.tile_size = tile_size
+        self.margin = margin
+        self.pixel_threshold = pixel_threshold        # per-pixel gray diff counted as a change
+        self.min_changed_pixels = min_changed_pixels  # changed pixels that make a tile dirty
+        self.full_frame_ratio = full_frame_ratio      # above this dirty share, just redo the frame
+
+        self.lock = threading.Lock()  # frames can be processed on two executor threads
+        self.prev_gray = None
+        self.prev_boxes = []
+        self.forced = []  # (x1, y1, x2, y2) areas that must be re-detected on the next frame
+        self.stats = {"full": 0, "incremental": 0, "unchanged": 0, "detected_area": 0.0}
+
+    def reset(self):
+        with self.lock:
+            self.prev_gray = None
+            self.prev_boxes = []
+            self.forced = []
+
+    def shift(self, dx, dy):
+        """
+        Move the reference frame and its boxes by a scroll of (dx, dy) px, so
+        only the newly revealed strip (and lines cut by the frame edge) is
+        re-detected.
+        """
+        with self.lock:
+            if self.prev_gray is None:
+                return
+            h, w = self.prev_gray.shape
+            moved = np.zeros_like(self.prev_gray)
+            moved[max(0, dy):h + min(0, dy), max(0, dx):w + min(0, dx)] = \
+                self.prev_gray[max(0, -dy):h - max(0, dy), max(0, -dx):w - max(0, dx)]
+            self.prev_gray = moved
+
+            # The revealed strips hold nothing known
+            if dy > 0:
+                self.forced.append((0, 0, w, dy))
+            elif dy < 0:
+                self.forced.append((0, h + dy, w, h))
+            if dx > 0:
+                self.forced.append((0, 0, dx, h))
+            elif dx < 0:
+                self.forced.append((w + dx, 0, w, h))
+
+            boxes = []
+            for box in self.prev_boxes:
+                box = np.asarray(box) + (dx, dy)
+                x1, y1, x2, y2 = box_bounds(box)
+                if x1 >= 0 and y1 >= 0 and x2 <= w and y2 <= h:
+                    boxes.append(box)
+                elif x2 > 0 and y2 > 0 and x1 < w and y1 < h:
+                    # Partly scrolled out: what is left of the line is re-detected
+                    self.forced.append((max(0, x1), max(0, y1), min(w, x2), min(h, y2)))
+            self.prev_boxes = boxes
+
+    def detect(self, frame_bgr, gray=None):
+        with self.lock:
+            return self._detect(frame_bgr, gray)
+
+    def _detect(self, frame_bgr, gray):
+        if gray is None:
+            gray = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY)
+        if self.prev_gray is None or self.prev_gray.shape != gray.shape:
+            return self._full(frame_bgr, gray)
+
+        dirty = self._dirty_tiles(gray)
+        self._force_tiles(dirty)
+        if not dirty.any():
+            # Keep the reference frame as is so slow drift still adds up to a change
+            self.stats["unchanged"] += 1
+            return list(self.prev_boxes)
+
+        h, w = gray.shape
+        regions = self._dirty_regions(dirty, gray.shape)
+        regions, carried = self._absorb_boxes(regions, self.prev_boxes)
+        regions = [(max(0, x1), max(0, y1), min(w, x2), min(h, y2)) for x1, y1, x2, y2 in regions]
+
+        area = sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in regions)
+        if area > self.full_frame_ratio * w * h:
+            return self._full(frame_bgr, gray)
+
+        scale = self.detector.scale_for(gray.shape)
+        boxes = carried
+        for x1, y1, x2, y2 in regions:
+            for box in self.detector.detect(frame_bgr[y1:y2, x1:x2], scale):
+                boxes.append(np.asarray(box) + (x1, y1))
+            # The reference frame only moves forward where boxes were re-detected
+            self.prev_gray[y1:y2, x1:x2] = gray[y1:y2, x1:x2]
+
+        self.stats["incremental"] += 1
+        self.stats["detected_area"] += area / (w * h)
+        self.prev_boxes = boxes
+        return list(boxes)
+
+    def summary(self):
+        s = self.stats
+        passes = s["full"] + s["incremental"]
+        avg_area = (s["full"] + s["detected_area"]) / passes if passes else 0.0
+        return (
+            f"full={s['full']} incremental={s['incremental']} unchanged={s['unchanged']} "
+            f"| avg detected area {avg_area:.0%}"
+        )
+
+    def _full(self, frame_bgr, gray):
+        self.forced = []
+        boxes = self.detector.detect(frame_bgr, self.detector.scale_for(gray.shape))
+        self.stats["full"] += 1
+        self.prev_gray = gray
+        self.prev_boxes = boxes
+        return list(boxes)
+
+    def _dirty_tiles(self, gray):
+        t = self.tile_size
+        h, w = gray.shape
+        changed = (cv2.absdiff(gray, self.prev_gray) > self.pixel_threshold).astype(np.uint16)
+        changed = np.pad(changed, ((0, -h % t), (0, -w % t)))
+        counts = changed.reshape(changed.shape[0] // t, t, changed.shape[1] // t, t).sum(axis=(1, 3))
+        return counts >= self.min_changed_pixels
+
+    def _force_tiles(self, dirty):
+        t = self.tile_size
+        for x1, y1, x2, y2 in self.forced:
+            dirty[y1 // t:-(-y2 // t), x1 // t:-(-x2 // t)] = True
+        self.forced = []
+
+    def _dirty_regions(self, dirty, shape):
+        t, m = self.tile_size, self.margin
+        h, w = shape
+        n, _, stats, _ = cv2.connectedComponentsWithStats(dirty.astype(np.uint8), connectivity=8)
+        regions = []
+        for tx, ty, tw, th, _ in stats[1:n]:
+            regions.append([
+                max(0, tx * t - m),
+                max(0, ty * t - m),
+                min(w, (tx + tw) * t + m),
+                min(h, (ty + th) * t + m),
+            ])
+        return regions
+
+    def _absorb_boxes(self, regions, boxes):
+        # Grow regions over every old box they touch and merge regions that
+        # end up overlapping, until nothing changes
+        bounds = [box_bounds(b) for b in boxes]
+        carried = list(range(len(boxes)))
+        changed = True
+        while changed:
+            changed = False
+            for i in list(carried):
+                bx1, by1, bx2, by2 = bounds[i]
+                for r in regions:
+                    if bx1 < r[2] and bx2 > r[0] and by1 < r[3] and by2 > r[1]:
+                        r[0], r[1] = min(r[0], bx1), min(r[1], by1)
+                        r[2], r[3] = max(r[2], bx2), max(r[3], by2)
+                        carried.remove(i)
+                        changed = True
+                        break
+            merged = []
+            for r in regions:
+                for q in merged:
+                    if r[0] < q[2] and r[2] > q[0] and r[1] < q[3] and r[3] > q[1]:
+                        q[0], q[1] = min(q[0], r[0]), min(q[1], r[1])
+                        q[2], q[3] = max(q[2], r[2]), max(q[3], r[3])
+                        changed = True
+                        break
+                else:
+                    merged.append(r)
+            regions = merged
+        return [tuple(int(v) for v in r) for r in regions], [boxes[i] for i in carried]
+
+
+def box_bounds(box):
+    pts = np.asarray(box)
+    x1, y1 = np.floor(pts.min(axis=0)).astype(int)
+    x2, y2 = np.ceil(pts.max(axis=0)).astype(int)
+    return x1, y1, x2, y2
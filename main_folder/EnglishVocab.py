@@ -0,0 +1,46 @@
+import gzip
+import os
+import re
+import sys
+
+# In a PyInstaller build the bundle is unpacked next to the other datas, not the modules
+BASE_DIR = getattr(sys, "_MEIPASS", os.path.dirname(os.path.abspath(__file__)))
+VOCAB_PATH = os.path.join(BASE_DIR, "english_vocab.txt.gz")
+
+
+def load(path=VOCAB_PATH):
+    """Load the bundled English vocabulary as a frozenset of lowercase words, no download needed."""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return frozenset(f.read().split("\n"))
+
+
+def build(words, path=VOCAB_PATH):
+    # contains_english_word lowercases its tokens and only keeps runs of 2+
+    # letters, so nothing else in a word list could ever match
+    vocab = frozenset(w for w in words if re.fullmatch(r"[a-z]{2,}", w))
+    # A sorted word list compresses to about half the size of a pickled set
+    # and loads just as fast
+    with gzip.GzipFile(path, "wb", compresslevel=9, mtime=0) as f:
+        f.write("\n".join(sorted(vocab)).encode("utf-8"))
+    return vocab
+
+
+if __name__ == "__main__":
+    # Rebuild the bundle from NLTK's words corpus, or from a plain word list
+    # (one word per line, e.g. /usr/share/dict/web2) given as an argument
+    import time
+
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], encoding="utf-8") as f:
+            words = f.read().split()
+    else:
+        import nltk
+        nltk.download('words')
+        from nltk.corpus import words as corpus
+        words = corpus.words()
+
+    vocab = build(words)
+    start = time.perf_counter()
+    load()
+    print(f"[Vocab] {len(vocab)} words -> {VOCAB_PATH} "
+          f"({os.path.getsize(VOCAB_PATH) / 1024:.0f} KB, loads in {(time.perf_counter() - start) * 1000:.0f} ms)")
@@ -0,0 +1,85 @@
+import cv2
+import imagehash
+import numpy as np
+
+UNCHANGED = "unchanged"
+CHANGED = "changed"
+
+
+class FrameChangeDetector:
+    """
+    Decides whether a captured frame differs from the last processed one.
+
+    Tier 1 samples every `stride`-th pixel of one channel straight from the
+    captured frame and counts samples that moved by more than
+    `pixel_threshold`. No samples moved: the frame is unchanged. At least
+    `changed_samples` moved: it changed (a short line of text is already a few
+    samples). Anything in between (a blinking cursor, a stray glyph,
+    compression noise) is settled by tier 2, a pHash comparison against the
+    last processed frame.
+
+    The reference frame only moves forward through accept(), so it always
+    describes the last frame that was actually sent for processing.
+    """
+
+    def __init__(self, stride=8, pixel_threshold=24, changed_samples=4, phash_threshold=2):
+        self.stride = stride
+        self.pixel_threshold = pixel_threshold
+        self.changed_samples = changed_samples
+        self.phash_threshold = phash_threshold
+
+        self.last_sample = None
+        self.last_hash = None
+        self.stats = {"sample_same": 0, "sample_changed": 0, "phash_same": 0, "phash_changed": 0}
+
+    def check(self, frame_bgr):
+        """Return (changed, signature); pass the signature to accept() if the frame gets processed."""
+        sample = np.ascontiguousarray(frame_bgr[::self.stride, ::self.stride, 1])
+        signature = {"sample": sample, "hash": None}
+
+        if self.last_sample is None or self.last_sample.shape != sample.shape:
+            self.stats["sample_changed"] += 1
+            return True, signature
+
+        moved = np.count_nonzero(cv2.absdiff(sample, self.last_sample) > self.pixel_threshold)
+        if moved == 0:
+            self.stats["sample_same"] += 1
+            return False, signature
+        if moved >= self.changed_samples:
+            self.stats["sample_changed"] += 1
+            return True, signature
+
+        signature["hash"] = phash_gray(cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY))
+        if self.last_hash is not None and signature["hash"] - self.last_hash <= self.phash_threshold:
+            self.stats["phash_same"] += 1
+            return False, signature
+        self.stats["phash_changed"] += 1
+        return True, signature
+
+    def accept(self, signature, frame_bgr):
+        self.last_sample = signature["sample"]
+        self.last_hash = signature["hash"]
+        if self.last_hash is None:
+            # pHash is only needed for inconclusive frames, so it is computed
+            # here once per processed frame rather than on every tick
+            self.last_hash = phash_gray(cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY))
+
+    def reset(self):
+        self.last_sample = None
+        self.last_hash = None
+
+    def summary(self):
+        s = self.stats
+        return (
+            f"sample: same={s['sample_same']} changed={s['sample_changed']} "
+            f"| phash: same={s['phash_same']} changed={s['phash_changed']}"
+        )
+
+
+def phash_gray(gray, hash_size=8, highfreq_factor=4):
+    # Same construction as imagehash.phash, but straight from a grayscale
+    # array instead of going through PIL
+    size = hash_size * highfreq_factor
+    small = cv2.resize(gray, (size, size), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:hash_size, :hash_size]
+    return imagehash.ImageHash(low > np.median(low))
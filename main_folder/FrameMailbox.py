@@ -0,0 +1,77 @@
+import threading
+
+
+class FrameCancelled(Exception):
+    """Raised at a checkpoint when a newer frame has arrived."""
+
+
+class FrameMailbox:
+    """
+    Single-slot, latest-frame-wins handoff between capture and processing.
+
+    put() overwrites any frame that has not been picked up yet, so the
+    consumer always gets the newest capture. Every put() bumps a generation
+    counter; the consumer checks it between stages to notice that the frame it
+    is working on has been superseded.
+    """
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.slot = None
+        self.generation = 0
+        self.busy = False
+        self.closed = False
+        self.stats = {"submitted": 0, "replaced": 0, "cancelled": 0, "completed": 0, "failed": 0}
+
+    def put(self, image, timestamp, force=False):
+        with self.cond:
+            if self.slot is not None:
+                self.stats["replaced"] += 1
+                # A forced refresh must survive being replaced by a regular frame
+                force = force or self.slot[3]
+            self.generation += 1
+            self.slot = (self.generation, image, timestamp, force)
+            self.stats["submitted"] += 1
+            self.cond.notify()
+
+    def take(self):
+        """Block until a frame is available; returns (generation, image, timestamp, force) or None once closed."""
+        with self.cond:
+            while self.slot is None and not self.closed:
+                self.cond.wait()
+            if self.closed:
+                return None
+            item, self.slot = self.slot, None
+            self.busy = True
+            return item
+
+    def done(self, cancelled=False, force=False, failed=False):
+        with self.cond:
+            self.busy = False
+            self.stats["failed" if failed else "cancelled" if cancelled else "completed"] += 1
+            if cancelled and force and self.slot is not None:
+                # Hand the forced refresh over to the frame that replaced it
+                self.slot = self.slot[:3] + (True,)
+
+    def is_stale(self, generation):
+        return generation != self.generation
+
+    def in_flight(self):
+        with self.cond:
+            return int(self.busy) + int(self.slot is not None)
+
+    def processing(self):
+        with self.cond:
+            return int(self.busy)
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def summary(self):
+        s = self.stats
+        return (
+            f"submitted={s['submitted']} completed={s['completed']} "
+            f"replaced={s['replaced']} cancelled={s['cancelled']} failed={s['failed']}"
+        )
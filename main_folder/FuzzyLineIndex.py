@@ -0,0 +1,180 @@
+from collections import defaultdict
+
+
+class FuzzyLineIndex:
+    """
+    Finds the stored line closest to an OCR line, within a bounded edit distance.
+
+    Two lines match when 1 - distance / longer length >= `threshold`, so a
+    dropped 。 or one misread kana still matches in a line of about 7+
+    characters at the default 0.85. Lines shorter than `min_length` only
+    match exactly, since one kana is the whole meaning there.
+
+    Lines are indexed by their character bigrams (with start/end markers).
+    An edit destroys at most two of a line's bigrams, so a line within k
+    edits shares at least (distinct bigrams - 2k) of them with the query;
+    only lines that pass that count (and the length difference) are
+    verified with a banded Levenshtein that stops once it exceeds k.
+    """
+
+    def __init__(self, threshold=0.85, min_length=4):
+        self.threshold = threshold
+        self.min_length = min_length
+        self.postings = defaultdict(set)  # bigram -> lines containing it
+        self.lines = set()
+
+    def __len__(self):
+        return len(self.lines)
+
+    def add(self, line):
+        if line in self.lines or len(line) < self.min_length:
+            return
+        self.lines.add(line)
+        for gram in _grams(line):
+            self.postings[gram].add(line)
+
+    def remove(self, line):
+        if line not in self.lines:
+            return
+        self.lines.discard(line)
+        for gram in _grams(line):
+            slot = self.postings.get(gram)
+            if slot is not None:
+                slot.discard(line)
+                if not slot:
+                    del self.postings[gram]
+
+    def nearest(self, line):
+        """Return (stored line, edit distance) of the best match, or None."""
+        if line in self.lines:
+            return line, 0
+        n = len(line)
+        if n < self.min_length or self.threshold >= 1.0:
+            return None
+        # Largest distance any candidate could be allowed (its length is at most n + k)
+        k_max = int((1 - self.threshold) * n / self.threshold)
+        if k_max == 0:
+            return None
+
+        grams = _grams(line)
+        needed = len(grams) - 2 * k_max
+        if needed <= 0:
+            return None  # too short for the filter to say anything; exact only
+        counts = defaultdict(int)
+        for gram in grams:
+            for candidate in self.postings.get(gram, ()):
+                counts[candidate] += 1
+
+        best, best_dist = None, k_max + 1
+        for candidate, shared in counts.items():
+            if shared < needed or abs(len(candidate) - n) > k_max:
+                continue
+            k = min(best_dist - 1, int((1 - self.threshold) * max(n, len(candidate))))
+            if k < abs(len(candidate) - n):
+                continue
+            dist = edit_distance(line, candidate, k)
+            if dist <= k:
+                best, best_dist = candidate, dist
+        return (best, best_dist) if best is not None else None
+
+
+def _grams(line):
+    padded = f"\x02{line}\x03"
+    return {padded[i:i + 2] for i in range(len(padded) - 1)}
+
+
+def edit_distance(a, b, max_distance):
+    """Levenshtein distance of a and b, or max_distance + 1 once it is known to be larger."""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    if len(a) > len(b):
+        a, b = b, a
+    over = max_distance + 1
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        # Only cells within max_distance of the diagonal can stay under the bound
+        lo, hi = max(1, i - max_distance), min(len(b), i + max_distance)
+        cur = [over] * (len(b) + 1)
+        if lo == 1:
+            cur[0] = i
+        ca = a[i - 1]
+        row_min = cur[0] if lo == 1 else over
+        for j in range(lo, hi + 1):
+            cost = prev[j - 1] + (ca != b[j - 1])
+            if prev[j] + 1 < cost:
+                cost = prev[j] + 1
+            if cur[j - 1] + 1 < cost:
+                cost = cur[j - 1] + 1
+            cur[j] = cost
+            if cost < row_min:
+                row_min = cost
+        if row_min > max_distance:
+            return over
+        prev = cur
+    return min(prev[len(b)], over)
+
+
+if __name__ == "__main__":
+    # Benchmark: index N synthetic lines, look up OCR-jittered copies
+    # (dropped 。, one misread kana) and unseen lines; compare against the
+    # linear SequenceMatcher scan this replaces.
+    #   python FuzzyLineIndex.py [--lines 5000] [--threshold 0.85]
+    import argparse
+    import random
+    import time
+    from difflib import SequenceMatcher
+    import numpy as np
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--threshold", type=float, default=0.85)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    kana = [chr(c) for c in range(0x3041, 0x3094)] + [chr(c) for c in range(0x30A1, 0x30F5)]
+    kanji = [chr(c) for c in range(0x4E00, 0x4E00 + 2000)]
+    pool = kana * 3 + kanji
+
+    def make_line():
+        return "".join(rng.choice(pool) for _ in range(rng.randint(6, 30))) + rng.choice(["。", "！", "？", ""])
+
+    def jitter(line):
+        if line[-1] in "。！？" and rng.random() < 0.5:
+            return line[:-1]
+        i = rng.randrange(len(line))
+        return line[:i] + rng.choice(kana) + line[i + 1:]
+
+    stored = list(dict.fromkeys(make_line() for _ in range(args.lines)))
+    index = FuzzyLineIndex(threshold=args.threshold)
+    start = time.perf_counter()
+    for line in stored:
+        index.add(line)
+    print(f"[Bench] indexed {len(index)} lines in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    targets = [rng.choice(stored) for _ in range(args.queries)]
+    queries = [(jitter(t), t) for t in targets] + [(make_line(), None) for _ in range(args.queries)]
+    times, found, wrong, false_pos = [], 0, 0, 0
+    for query, target in queries:
+        start = time.perf_counter()
+        match = index.nearest(query)
+        times.append(time.perf_counter() - start)
+        if target is None:
+            false_pos += match is not None
+        elif match is None:
+            pass
+        elif match[0] == target:
+            found += 1
+        else:
+            wrong += 1
+    us = np.array(times) * 1e6
+    print(f"[Bench] index: median {np.median(us):.0f} us, p99 {np.percentile(us, 99):.0f} us per lookup")
+    print(f"[Bench] jittered found {found}/{args.queries} ({wrong} matched another line), "
+          f"unseen matched {false_pos}/{args.queries}")
+
+    sample = queries[:50]
+    start = time.perf_counter()
+    for query, _ in sample:
+        max(stored, key=lambda s: SequenceMatcher(None, query, s).ratio())
+    per = (time.perf_counter() - start) / len(sample)
+    print(f"[Bench] SequenceMatcher scan: {per * 1000:.1f} ms per lookup ({per * 1e6 / np.median(us):.0f}x slower)")
@@ -0,0 +1,213 @@
+import threading
+import time
+from collections import deque, OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+
+# Seconds; covers a sub-millisecond hash up to a multi-second cold OCR pass
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+STAGE_SECONDS = "rtocr_stage_seconds"
+END_TO_END_SECONDS = "rtocr_end_to_end_seconds"
+FIRST_CAPTION_SECONDS = "rtocr_time_to_first_caption_seconds"
+
+
+class Histogram:
+    """Prometheus-style cumulative histogram, plus the most recent samples for the live panel."""
+
+    def __init__(self, buckets=BUCKETS, recent=256):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=recent)
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        with self.lock:
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+            self.recent.append(value)
+
+    def quantiles(self, *qs):
+        with self.lock:
+            recent = list(self.recent)
+        if not recent:
+            return [0.0] * len(qs)
+        return [float(v) for v in np.percentile(recent, [q * 100 for q in qs])]
+
+
+class Registry:
+    """
+    Histograms are observed by the code being timed. Gauges and counters are
+    callbacks read at scrape time, so components keep their own stats dicts
+    and nothing has to be updated twice.
+    """
+
+    def __init__(self):
+        self.help = {
+            STAGE_SECONDS: ("histogram", "Time spent per pipeline stage"),
+            END_TO_END_SECONDS: ("histogram", "Screen capture of a change until its captions are shown"),
+            FIRST_CAPTION_SECONDS: ("histogram", "Screen capture of a change until the first of its captions is shown"),
+        }
+        self.histograms = OrderedDict()  # (name, labels) -> Histogram
+        self.callbacks = OrderedDict()   # (name, labels) -> fn
+        self.lock = threading.Lock()
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        hist = self.histograms.get(key)
+        if hist is None:
+            with self.lock:
+                hist = self.histograms.setdefault(key, Histogram())
+        hist.observe(value)
+
+    def register(self, kind, name, help_text, fn, **labels):
+        """Expose fn() as a gauge or counter; registering the same name and labels again replaces it."""
+        with self.lock:
+            self.help.setdefault(name, (kind, help_text))
+            self.callbacks[(name, tuple(sorted(labels.items())))] = fn
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        with self.lock:
+            histograms = list(self.histograms.items())
+            callbacks = list(self.callbacks.items())
+        families = OrderedDict()
+        for (name, labels), hist in histograms:
+            families.setdefault(name, []).append((labels, hist))
+        for (name, labels), fn in callbacks:
+            families.setdefault(name, []).append((labels, fn))
+
+        lines = []
+        for name, series in families.items():
+            kind, help_text = self.help.get(name, ("gauge", ""))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in series:
+                if isinstance(value, Histogram):
+                    with value.lock:
+                        counts, total, count = list(value.counts), value.sum, value.count
+                    for bound, n in zip(value.buckets, counts):
+                        lines.append(f"{name}_bucket{_labels(labels + (('le', repr(bound)),))} {n}")
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {count}")
+                    lines.append(f"{name}_sum{_labels(labels)} {total}")
+                    lines.append(f"{name}_count{_labels(labels)} {count}")
+                else:
+                    try:
+                        lines.append(f"{name}{_labels(labels)} {float(value())}")
+                    except Exception as e:
+                        print(f"[Metrics] {name} failed:", e)
+        return "\n".join(lines) + "\n"
+
+    def panel_text(self):
+        """Compact plain-text view for the ControlBox panel."""
+        with self.lock:
+            histograms = list(self.histograms.items())
+            callbacks = list(self.callbacks.items())
+        lines = [f"{'stage':<15}{'p50':>8}{'p90':>8}{'n':>7}"]
+        for (name, labels), hist in histograms:
+            label = dict(labels).get("stage", _PANEL_LABELS.get(name, name))
+            p50, p90 = hist.quantiles(0.5, 0.9)
+            lines.append(f"{label:<15}{p50 * 1000:>6.0f}ms{p90 * 1000:>6.0f}ms{hist.count:>7}")
+        values = []
+        for (name, labels), fn in callbacks:
+            try:
+                value = float(fn())
+            except Exception:
+                continue
+            label = ",".join(v for _, v in labels) or name
+            short = name.replace("rtocr_", "").replace("_total", "")
+            text = f"{value:.0%}" if name.endswith("_ratio") else f"{value:.0f}"
+            values.append(f"{short}[{label}]={text}")
+        for i in range(0, len(values), 3):
+            lines.append("  ".join(values[i:i + 3]))
+        return "\n".join(lines)
+
+
+_PANEL_LABELS = {END_TO_END_SECONDS: "end-to-end", FIRST_CAPTION_SECONDS: "first caption"}
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+
+REGISTRY = Registry()
+
+# Captions in flight: JP lines of an OCR result -> [capture time of its frame, first caption shown]
+_captions = OrderedDict()
+_captions_lock = threading.Lock()
+
+
+def observe_stage(stage, seconds):
+    REGISTRY.observe(STAGE_SECONDS, seconds, stage=stage)
+
+
+def gauge(name, help_text, fn, **labels):
+    REGISTRY.register("gauge", name, help_text, fn, **labels)
+
+
+def counter(name, help_text, fn, **labels):
+    REGISTRY.register("counter", name, help_text, fn, **labels)
+
+
+def caption_started(jp_texts, captured_at):
+    """An OCR result left OCRWorker; captured_at is the time.time() its frame was captured."""
+    with _captions_lock:
+        _captions[tuple(jp_texts)] = [captured_at, False]
+        while len(_captions) > 32:
+            _captions.popitem(last=False)
+
+
+def first_caption_shown(jp_texts):
+    """The first caption of an OCR result is on screen; observed once per result."""
+    with _captions_lock:
+        entry = _captions.get(tuple(jp_texts))
+        if entry is None or entry[1]:
+            return
+        entry[1] = True
+    REGISTRY.observe(FIRST_CAPTION_SECONDS, time.time() - entry[0])
+
+
+def caption_shown(jp_texts):
+    """Captions for all these JP lines are on screen; closes the end-to-end measurement."""
+    if jp_texts:
+        first_caption_shown(jp_texts)
+    with _captions_lock:
+        entry = _captions.pop(tuple(jp_texts), None)
+    if entry is not None:
+        REGISTRY.observe(END_TO_END_SECONDS, time.time() - entry[0])
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(port=9464, host="127.0.0.1"):
+    """Serve /metrics on a daemon thread; returns the server, or None if the port is taken."""
+    try:
+        server = ThreadingHTTPServer((host, port), _Handler)
+    except OSError as e:
+        print(f"[Metrics] Could not listen on {host}:{port}:", e)
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="MetricsServer", daemon=True).start()
+    print(f"[Metrics] Serving http://{host}:{port}/metrics")
+    return server
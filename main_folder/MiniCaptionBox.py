@@ -1,9 +1,13 @@
 from PyQt5 import QtWidgets, QtCore, QtGui
+import time
 import ctypes
 import ctypes.wintypes
 # import win is installed and working, but not recognized, use type ignore to get rid of warning
 import win32gui # type: ignore
 import win32con # type: ignore
+from collections import OrderedDict
+import Metrics
+from TranslationMemory import normalize
 
 
 class MiniCaptionBox(QtWidgets.QWidget):
@@ -99,12 +103,17 @@ class MiniCaptionBox(QtWidgets.QWidget):
 class MiniCaptionBoxManager:
     def __init__(self, parent=None):
         self.parent = parent
-        # holds dicts: {'jp_text': str, 'box': MiniCaptionBox}
+        # holds dicts: {'jp_text': str, 'line_id': str, 'coords': (x,y,w,h), 'box': MiniCaptionBox or None}
+        # a line's box goes up once its translation is in
         self.items = []
-        # staging until we have both coords & texts
+        # staging until we have both coords & texts of one OCR result
         self.pending_coords = None
         self.pending_jp_texts = None
-        self.pending_en_texts = None
+        # line ID -> EN, as TranslateWorker hands them out line by line
+        self.translations = OrderedDict()
+        # the OCR result on screen, and its line IDs still without a caption
+        self.current = ()
+        self.waiting = set()
 
         self.visible_state = True
 
@@ -113,60 +122,92 @@ class MiniCaptionBoxManager:
         self.pending_coords = coords_list
         self._maybe_update()
 
-    def on_new_texts(self, jp_texts, en_texts):
-        """Slot to receive both JP and EN text lists."""
+    def on_new_texts(self, jp_texts):
+        """Slot to receive the OCR'd JP lines, in the same order as the coords."""
         self.pending_jp_texts = jp_texts
-        self.pending_en_texts = en_texts
         self._maybe_update()
 
+    def on_line_translated(self, line_id, jp_text, en_text):
+        """Slot for one translated line: puts up or updates every box showing it."""
+        self.translations[line_id] = en_text
+        self.translations.move_to_end(line_id)
+        while len(self.translations) > 512:
+            self.translations.popitem(last=False)
+
+        start = time.perf_counter()
+        for item in self.items:
+            if item['line_id'] == line_id:
+                if item['box'] is None:
+                    item['box'] = self._new_box(*item['coords'])
+                item['box'].set_text(en_text)
+        Metrics.observe_stage("gui_update", time.perf_counter() - start)
+
+        if line_id in self.waiting:
+            self.waiting.discard(line_id)
+            Metrics.first_caption_shown(self.current)
+            if not self.waiting:
+                Metrics.caption_shown(self.current)
+
     def _maybe_update(self):
-        if (self.pending_coords is None or 
-            self.pending_jp_texts is None or 
-            self.pending_en_texts is None):
+        if self.pending_coords is None or self.pending_jp_texts is None:
             return
         coords = self.pending_coords
         jp_texts = self.pending_jp_texts
-        en_texts = self.pending_en_texts
         # clear staging
         self.pending_coords = None
         self.pending_jp_texts = None
-        self.pending_en_texts = None
         # diff & reconcile
-        self._diff_and_reconcile(jp_texts, en_texts, coords)
-
-    def _diff_and_reconcile(self, jp_texts, en_texts, coords):
+        start = time.perf_counter()
+        self._diff_and_reconcile(jp_texts, coords)
+        Metrics.observe_stage("gui_update", time.perf_counter() - start)
+
+        self.current = tuple(jp_texts)
+        self.waiting = {item['line_id'] for item in self.items if item['box'] is None}
+        if len(self.waiting) < len(self.items):
+            Metrics.first_caption_shown(self.current)
+        if not self.waiting:
+            Metrics.caption_shown(self.current)
+
+    def _diff_and_reconcile(self, jp_texts, coords):
         new_items = []
         used_old = set()
-        # 1) match existing boxes by JP text, update geometry and text
-        for jp, en, (x, y, w, h) in zip(jp_texts, en_texts, coords):
+        # 1) match existing boxes by line ID, update geometry and text
+        for jp, (x, y, w, h) in zip(jp_texts, coords):
+            line_id = normalize(jp)
+            en = self.translations.get(line_id)
             match_idx = next(
                 (i for i, item in enumerate(self.items)
-                 if i not in used_old and item['jp_text'] == jp),
+                 if i not in used_old and item['line_id'] == line_id),
                 None
             )
+            box = None
             if match_idx is not None:
-                item = self.items[match_idx]
-                box = item['box']
-                box.setGeometry(x, y, w, h)
-                box.set_text(en)
+                box = self.items[match_idx]['box']
                 used_old.add(match_idx)
-            else:
-                # create a new box for unseen JP text
-                box = MiniCaptionBox(x, y, w, h)
-                box.make_click_through()
-                if self.parent:
-                    box.setParent(self.parent)
-                box.set_text(en)
-            new_items.append({'jp_text': jp, 'box': box})
+            if box is None and en is not None:
+                # create a new box for a line we already have the translation of
+                box = self._new_box(x, y, w, h)
+            if box is not None:
+                box.setGeometry(x, y, w, h)
+                if en is not None:
+                    box.set_text(en)
+            new_items.append({'jp_text': jp, 'line_id': line_id, 'coords': (x, y, w, h), 'box': box})
         # 2) remove boxes that disappeared
         for i, item in enumerate(self.items):
-            if i not in used_old:
+            if i not in used_old and item['box'] is not None:
                 old_box = item['box']
                 old_box.close()
                 old_box.deleteLater()
         # 3) update roster
         self.items = new_items
 
+    def _new_box(self, x, y, w, h):
+        box = MiniCaptionBox(x, y, w, h)
+        box.make_click_through()
+        if self.parent:
+            box.setParent(self.parent)
+        return box
+
     def toggle_visibility(self):
         """
         Toggle the visibility of *all* mini caption boxes.
@@ -176,6 +217,8 @@ class MiniCaptionBoxManager:
 
         for item in self.items:
             box = item['box']
+            if box is None:
+                continue
             if self.visible_state:
                 box.show()
                 # Let mouse events through again
@@ -0,0 +1,94 @@
+from collections import deque
+import numpy as np
+from BoxMerger import merge_boxes, polygons_to_boxes
+
+
+class MultiScaleDetector:
+    """
+    Picks the resolution text detection runs at and maps boxes back.
+
+    detect_fn(image, long_size) must return 4-point boxes in image
+    coordinates (CRAFT resizes its input so the long side is long_size). A
+    frame is detected at `scale_for()` of its full resolution: never above
+    `max_long_side` or `max_scale`, and with `auto_scale` low enough that the
+    median glyph seen so far comes out at about `target_glyph` px, which is
+    plenty for large manga text. Boxes always come back in full-resolution
+    coordinates, so crops are still cut from the original capture.
+
+    Text that ends up smaller than `small_glyph` px at the detection scale
+    may be missed or clipped, so the neighbourhood of such boxes gets a
+    second pass at full resolution that replaces the low-resolution boxes.
+    """
+
+    def __init__(self, detect_fn, max_long_side=1280, max_scale=1.0, auto_scale=True, target_glyph=24,
+                 min_scale=0.25, small_glyph=10, history=200, min_samples=10, scale_step=0.125):
+        self.detect_fn = detect_fn
+        self.max_long_side = max_long_side
+        self.max_scale = max_scale
+        self.auto_scale = auto_scale
+        self.target_glyph = target_glyph  # px at detection scale
+        self.min_scale = min_scale
+        self.small_glyph = small_glyph    # px at detection scale
+        self.min_samples = min_samples
+        self.scale_step = scale_step      # scales are rounded to steps so they don't jitter
+
+        self.glyphs = deque(maxlen=history)  # recent glyph sizes in full-resolution px
+        self.stats = {"passes": 0, "scale_sum": 0.0, "fallback_areas": 0, "fallback_area": 0.0}
+
+    def scale_for(self, shape):
+        h, w = shape[:2]
+        scale = min(self.max_scale, self.max_long_side / max(h, w))
+        if self.auto_scale and len(self.glyphs) >= self.min_samples:
+            scale = min(scale, max(self.min_scale, self.target_glyph / np.median(self.glyphs)))
+        return max(self.scale_step, np.floor(scale / self.scale_step) * self.scale_step)
+
+    def detect(self, image, scale):
+        """Detect text in `image` at `scale` of its resolution; boxes are in `image` coordinates."""
+        h, w = image.shape[:2]
+        boxes = [np.asarray(b) for b in self.detect_fn(image, max(32, round(max(h, w) * scale)))]
+        self.stats["passes"] += 1
+        self.stats["scale_sum"] += scale
+
+        if scale < 1.0 and boxes:
+            boxes = self._refine_small(image, boxes, scale)
+
+        bounds = polygons_to_boxes(boxes)
+        if len(bounds):
+            self.glyphs.extend(np.minimum(bounds[:, 2] - bounds[:, 0], bounds[:, 3] - bounds[:, 1]).tolist())
+        return boxes
+
+    def summary(self):
+        s = self.stats
+        passes = max(s["passes"], 1)
+        median = f"{np.median(self.glyphs):.0f}px" if self.glyphs else "n/a"
+        return (
+            f"mean scale {s['scale_sum'] / passes:.2f} | median glyph {median} "
+            f"| small-text fallback: {s['fallback_areas']} areas, avg {s['fallback_area'] / passes:.0%} of a pass"
+        )
+
+    def _refine_small(self, image, boxes, scale):
+        h, w = image.shape[:2]
+        bounds = polygons_to_boxes(boxes)
+        glyph = np.minimum(bounds[:, 2] - bounds[:, 0], bounds[:, 3] - bounds[:, 1])
+        small = glyph * scale < self.small_glyph
+        if not small.any():
+            return boxes
+
+        # Grow every small box by a couple of glyphs (its neighbours are
+        # likely missed text of the same size) and merge what overlaps
+        pad = np.maximum(glyph[small], 4)[:, None] * 2
+        areas = bounds[small] + np.hstack([-pad, -pad, pad, pad])
+        areas = np.clip(areas, 0, [w, h, w, h])
+        areas = merge_boxes(areas, x_thresh=0, y_thresh=0)
+
+        centers = (bounds[:, :2] + bounds[:, 2:]) / 2
+        keep = np.ones(len(boxes), dtype=bool)
+        refined = []
+        for x1, y1, x2, y2 in areas:
+            inside = (centers[:, 0] >= x1) & (centers[:, 0] < x2) & (centers[:, 1] >= y1) & (centers[:, 1] < y2)
+            keep &= ~inside
+            for box in self.detect_fn(image[y1:y2, x1:x2], max(32, max(x2 - x1, y2 - y1))):
+                refined.append(np.asarray(box) + (x1, y1))
+            self.stats["fallback_area"] += (x2 - x1) * (y2 - y1) / (w * h)
+        self.stats["fallback_areas"] += len(areas)
+        return [b for b, k in zip(boxes, keep) if k] + refined
@@ -0,0 +1,308 @@
+import itertools
+import math
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, defaultdict
+import cv2
+import numpy as np
+
+
+class OCRCache:
+    """
+    Size-bounded LRU cache of OCR results keyed by a perceptual hash of the crop.
+
+    Keys are (aspect_bucket, dhash) pairs computed on the crop trimmed to its
+    ink, so a crop window that shifts by a pixel or two still hashes the same
+    text. The 256-bit hash is far too coarse to tell lines apart that differ
+    by one character ("HP 120/150" vs "HP 121/150" is a few bits, "fox" vs
+    "fax" in a long line two), so it only finds candidates: a hit, exact or
+    within `max_distance` bits, is returned only if the crop's thumbnail
+    (see thumbnail()) matches the stored one too. Lookups without a
+    thumbnail get exact hits only.
+
+    Near matches are found with a multi-index table: the hash is split into
+    max_distance + 1 bands, so by pigeonhole any hash within the radius shares
+    at least one band exactly with the query.
+
+    With `db_path` set, entries are also written to SQLite and the most
+    recently used ones are loaded back on startup. Writes are committed by
+    flush() (once per frame) and close(), not per entry. Rows written before
+    thumbnails were stored have none and can't be verified, they only serve
+    exact hits to lookups without a thumbnail and are replaced on the next put.
+    """
+
+    HASH_SIZE = 16  # dHash grid side, 16 * 16 = 256 bits
+    MAX_DISTANCE = 4  # dHash bits capture jitter costs
+
+    def __init__(self, max_entries=2048, max_distance=MAX_DISTANCE, db_path=None):
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self.lock = threading.Lock()
+
+        self.entries = OrderedDict()  # (bucket, dhash) -> (text, thumbnail), oldest first
+        bits = self.HASH_SIZE * self.HASH_SIZE
+        n_bands = max_distance + 1
+        self.band_bits = math.ceil(bits / n_bands)
+        self.band_mask = (1 << self.band_bits) - 1
+        self.n_bands = n_bands
+        self.bands = [defaultdict(set) for _ in range(n_bands)]
+
+        self.hits = 0
+        self.near_hits = 0
+        self.rejected = 0  # hash matches whose thumbnail didn't
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.db = None
+        if db_path:
+            self._open_db(db_path)
+
+    def key(self, crop):
+        return self.describe(crop)[0]
+
+    def describe(self, crop):
+        """Return (key, thumbnail) for a crop; pass both to get() and put()."""
+        gray = crop if crop.ndim == 2 else cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+        gray = trim_to_ink(gray)
+        return self._key(gray), thumbnail(gray)
+
+    def _key(self, gray):
+        h, w = gray.shape[:2]
+        # The ink box can still gain or lose a pixel between frames, so only
+        # the coarse shape takes part in the key
+        bucket = round(math.log2(max(w, 1) / max(h, 1)) * 2)
+        small = cv2.resize(gray, (self.HASH_SIZE + 1, self.HASH_SIZE), interpolation=cv2.INTER_AREA)
+        diff = small[:, 1:] > small[:, :-1]
+        dhash = int.from_bytes(np.packbits(diff).tobytes(), "big")
+        return (bucket, dhash)
+
+    def get(self, key, thumb=None):
+        """Return the cached text for `key` (exact or near-duplicate, verified with `thumb`), or None on a miss."""
+        with self.lock:
+            if key in self.entries:
+                text, stored = self.entries[key]
+                if self._verified(thumb, stored, exact=True):
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return text
+            else:
+                for near in self._near(key) if thumb is not None else ():
+                    text, stored = self.entries[near]
+                    if self._verified(thumb, stored):
+                        self.entries.move_to_end(near)
+                        self.near_hits += 1
+                        return text
+
+                if self.db is not None:
+                    row = self.db.execute(
+                        "SELECT text, thumb FROM ocr_cache WHERE bucket = ? AND hash = ?",
+                        (key[0], format(key[1], "x")),
+                    ).fetchone()
+                    if row is not None and self._verified(thumb, _decode(row[1]), exact=True):
+                        self._insert(key, row[0], _decode(row[1]))
+                        self.disk_hits += 1
+                        return row[0]
+
+            self.misses += 1
+            return None
+
+    def put(self, key, text, thumb=None):
+        with self.lock:
+            if key in self.entries:
+                self.entries[key] = (text, thumb)
+                self.entries.move_to_end(key)
+            else:
+                self._insert(key, text, thumb)
+            if self.db is not None:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO ocr_cache (bucket, hash, text, last_used, thumb) VALUES (?, ?, ?, ?, ?)",
+                    (key[0], format(key[1], "x"), text, time.time(), _encode(thumb)),
+                )
+
+    def flush(self):
+        """Commit the entries put since the last flush to SQLite."""
+        with self.lock:
+            if self.db is not None:
+                self.db.commit()
+
+    def stats(self):
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "near_hits": self.near_hits,
+            "rejected": self.rejected,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def summary(self):
+        s = self.stats()
+        lookups = s["hits"] + s["near_hits"] + s["disk_hits"] + s["misses"]
+        hit_rate = (lookups - s["misses"]) / lookups if lookups else 0.0
+        return (
+            f"{s['entries']}/{self.max_entries} entries | hits={s['hits']} near={s['near_hits']} "
+            f"disk={s['disk_hits']} misses={s['misses']} (rejected={s['rejected']}) evictions={s['evictions']} "
+            f"| hit rate {hit_rate:.0%}"
+        )
+
+    def close(self):
+        with self.lock:
+            if self.db is not None:
+                self.db.commit()
+                self.db.close()
+                self.db = None
+
+    def _band_values(self, dhash):
+        return [(dhash >> (i * self.band_bits)) & self.band_mask for i in range(self.n_bands)]
+
+    def _near(self, key):
+        # Stored keys within max_distance bits, closest first
+        bucket, dhash = key
+        found = {}
+        for band, value in zip(self.bands, self._band_values(dhash)):
+            for candidate in band.get((bucket, value), ()):
+                if candidate not in found:
+                    found[candidate] = (candidate[1] ^ dhash).bit_count()
+        return sorted((c for c, d in found.items() if d <= self.max_distance), key=found.get)
+
+    def _verified(self, thumb, stored, exact=False):
+        # Exact hash hits without thumbnails on either side keep the old behavior;
+        # anything else needs two thumbnails that agree
+        if thumb is None or stored is None:
+            return exact and thumb is None
+        if same_text(thumb, stored):
+            return True
+        self.rejected += 1
+        return False
+
+    def _insert(self, key, text, thumb=None):
+        self.entries[key] = (text, thumb)
+        bucket, dhash = key
+        for band, value in zip(self.bands, self._band_values(dhash)):
+            band[(bucket, value)].add(key)
+        while len(self.entries) > self.max_entries:
+            self._evict_oldest()
+
+    def _evict_oldest(self):
+        old_key, _ = self.entries.popitem(last=False)
+        bucket, dhash = old_key
+        for band, value in zip(self.bands, self._band_values(dhash)):
+            slot = band.get((bucket, value))
+            if slot is not None:
+                slot.discard(old_key)
+                if not slot:
+                    del band[(bucket, value)]
+        self.evictions += 1
+
+    def _open_db(self, db_path):
+        # process_frame runs on executor threads, access is serialized by self.lock
+        self.db = sqlite3.connect(db_path, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS ocr_cache ("
+            "bucket INTEGER, hash TEXT, text TEXT, last_used REAL, "
+            "PRIMARY KEY (bucket, hash))"
+        )
+        columns = [row[1] for row in self.db.execute("PRAGMA table_info(ocr_cache)")]
+        if "thumb" not in columns:
+            self.db.execute("ALTER TABLE ocr_cache ADD COLUMN thumb BLOB")
+        self.db.commit()
+        rows = self.db.execute(
+            "SELECT bucket, hash, text, thumb FROM ocr_cache ORDER BY last_used DESC LIMIT ?",
+            (self.max_entries,),
+        ).fetchall()
+        # Insert oldest first so the LRU order matches last_used
+        for bucket, hex_hash, text, thumb in reversed(rows):
+            self._insert((bucket, int(hex_hash, 16)), text, _decode(thumb))
+        print(f"[OCRCache] Loaded {len(rows)} entries from {db_path}")
+
+
+def trim_to_ink(gray):
+    # Otsu splits ink from background; the ink is whichever side is smaller
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    if cv2.countNonZero(binary) > binary.size // 2:
+        binary = cv2.bitwise_not(binary)
+    points = cv2.findNonZero(binary)
+    if points is None:
+        return gray
+    x, y, w, h = cv2.boundingRect(points)
+    return gray[y:y + h, x:x + w]
+
+
+THUMB_HEIGHT = 24       # thumbnails are at most this tall...
+THUMB_MAX_WIDTH = 640   # ...and this wide; smaller crops keep their pixel size
+THUMB_TOLERANCE = 0.06  # largest mean difference (0..1) over any glyph-sized window
+
+
+def thumbnail(gray):
+    """
+    Normalized thumbnail of an ink-trimmed grayscale crop for same_text().
+
+    The crop keeps its pixel scale (shrunk by a whole factor if large), so a
+    re-captured line lines up pixel for pixel with the stored one instead of
+    being stretched by a one-pixel change of its ink box. Contrast is
+    stretched and the ink is always bright.
+    """
+    h, w = gray.shape[:2]
+    step = max(-(-h // THUMB_HEIGHT), -(-w // THUMB_MAX_WIDTH), 1)
+    if step > 1:
+        gray = cv2.resize(gray, (max(1, w // step), max(1, h // step)), interpolation=cv2.INTER_AREA)
+    lo, hi = np.percentile(gray, (1, 99))
+    thumb = cv2.convertScaleAbs(gray, alpha=255.0 / max(hi - lo, 1.0), beta=-lo * 255.0 / max(hi - lo, 1.0))
+    if thumb.mean() > 127:
+        thumb = 255 - thumb
+    return thumb
+
+
+def same_text(a, b, tolerance=THUMB_TOLERANCE):
+    """
+    Whether two thumbnails show the same text: same size give or take two
+    pixels, and at the best of nine one-pixel alignments no glyph-sized
+    window differs by more than `tolerance` on average. A one-character
+    change is a window of large difference however long the line is.
+    """
+    if abs(a.shape[0] - b.shape[0]) > 2 or abs(a.shape[1] - b.shape[1]) > 2:
+        return False
+    h, w = max(a.shape[0], b.shape[0]) + 2, max(a.shape[1], b.shape[1]) + 2
+    pa = np.zeros((h, w), np.float32)
+    pa[1:1 + a.shape[0], 1:1 + a.shape[1]] = a
+    window = (max(1, h // 4), h)
+    limit = tolerance * 255
+    for dy, dx in itertools.product(range(3), range(3)):
+        pb = np.zeros((h, w), np.float32)
+        pb[dy:dy + b.shape[0], dx:dx + b.shape[1]] = b
+        if cv2.blur(cv2.absdiff(pa, pb), window).max() <= limit:
+            return True
+    return False
+
+
+def _encode(thumb):
+    return None if thumb is None else cv2.imencode(".png", thumb)[1].tobytes()
+
+
+def _decode(blob):
+    return None if blob is None else cv2.imdecode(np.frombuffer(blob, np.uint8), cv2.IMREAD_GRAYSCALE)
+
+
+if __name__ == "__main__":
+    # Lines that differ by one character must not share a cache entry, the
+    # same line re-captured in a shifted window must:
+    #   python OCRCache.py
+    def render(text, margin=(0, 0)):
+        image = np.full((40 + margin[1], 16 * len(text) + 40 + margin[0]), 255, np.uint8)
+        cv2.putText(image, text, (10 + margin[0], 28 + margin[1]), cv2.FONT_HERSHEY_SIMPLEX, 0.6, 0, 1, cv2.LINE_AA)
+        return image
+
+    pairs = [("HP 120/150", "HP 121/150"), ("Chapter 12 begins", "Chapter 13 begins"),
+             ("The quick brown fox jumps over the lazy dog", "The quick brown fax jumps ever the lazy dog")]
+    for text, changed in pairs:
+        cache = OCRCache()
+        key, thumb = cache.describe(render(text))
+        cache.put(key, text, thumb)
+        other_key, other_thumb = cache.describe(render(changed))
+        again = cache.get(*cache.describe(render(text, margin=(3, 2))))
+        print(f"[OCRCache] {text!r} vs {changed!r}: {(key[1] ^ other_key[1]).bit_count()} bits apart, "
+              f"lookup -> {cache.get(other_key, other_thumb)!r} | re-captured -> {again!r}")
+        assert cache.get(other_key, other_thumb) is None and again == text
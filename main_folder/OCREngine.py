@@ -0,0 +1,177 @@
+import re
+import threading
+import time
+import numpy as np
+import EnglishVocab
+import Metrics
+import StartupTimer
+from ScriptClassifier import ScriptClassifier, JAPANESE, NON_TEXT
+from TextDetector import make_detector, TORCH, DEFAULT_ONNX_PATH
+
+CRAFT_LONG_SIZE = 1280  # Craft's default inference size
+
+# Filled in by load_models(), once per process. The heavy imports happen
+# there too, so importing this module (and OCRWorker) costs nothing
+english_vocab = None
+mo = None
+easyocr_reader = None
+_load_lock = threading.Lock()
+
+
+def load_models():
+    # The text detector is per engine (see TextDetector), the recognizers are shared
+    global english_vocab, mo, easyocr_reader
+    with _load_lock:
+        if mo is not None:
+            return
+        with StartupTimer.phase("import torch"):
+            import torch
+        print("CUDA Available:", torch.cuda.is_available())
+        print("Device:", torch.device("cuda" if torch.cuda.is_available() else "cpu"))
+
+        with StartupTimer.phase("English vocabulary"):
+            english_vocab = EnglishVocab.load()
+
+        with StartupTimer.phase("load MangaOCR"):
+            from manga_ocr import MangaOcr
+            mo = MangaOcr()
+        with StartupTimer.phase("load EasyOCR"):
+            import easyocr
+            easyocr_reader = easyocr.Reader(['en'], gpu=True)
+
+
+class LocalOCREngine:
+    """
+    CRAFT detection and script gate + EasyOCR + MangaOCR recognition, run in
+    the calling process. ProcessOCREngine runs one of these in every worker.
+
+    The models load on a background thread started here, followed by one
+    dummy pass through each of them so the first real frame doesn't pay for
+    lazy initialization. detect() and recognize() block until that is done.
+    """
+
+    def __init__(self, ocr_batch_size=8, detector=TORCH, onnx_path=DEFAULT_ONNX_PATH, onnx_threads=0,
+                 verbose=False):
+        self.long_size = CRAFT_LONG_SIZE
+        self.ocr_batch_size = ocr_batch_size
+        self.detector_kind = detector
+        self.onnx_path = onnx_path
+        self.onnx_threads = onnx_threads
+        self.detector = None
+        self.batch_ocr = None
+        self.script_gate = ScriptClassifier()
+        self.verbose = verbose  # per-pass script gate summary on stdout
+        # Seconds spent per stage, for the utilization breakdown
+        self.timings = {"detect": 0.0, "gate": 0.0, "easyocr": 0.0, "mangaocr": 0.0}
+
+        self.ready = threading.Event()
+        self.error = None
+        self.loader = threading.Thread(target=self._warm_up, name="ModelWarmup", daemon=True)
+        self.loader.start()
+
+    def wait_ready(self):
+        self.ready.wait()
+        if self.error is not None:
+            raise RuntimeError("OCR models failed to load") from self.error
+
+    def _warm_up(self):
+        try:
+            load_models()
+            import torch
+            with StartupTimer.phase(f"load text detector ({self.detector_kind})"):
+                self.detector = make_detector(self.detector_kind, cuda=torch.cuda.is_available(),
+                                              onnx_path=self.onnx_path, onnx_threads=self.onnx_threads)
+            from BatchMangaOCR import BatchMangaOCR
+            self.batch_ocr = BatchMangaOCR(mo, max_batch_size=self.ocr_batch_size)
+            with StartupTimer.phase("warm-up inference"):
+                blank = np.full((64, 256, 3), 255, dtype=np.uint8)
+                self.detector.detect(blank, 256)
+                easyocr_reader.readtext(blank, detail=0)
+                self.batch_ocr([blank])
+        except Exception as e:
+            print("[OCREngine] Model warm-up failed:", e)
+            self.error = e
+        finally:
+            self.ready.set()
+            StartupTimer.report()
+
+    def detect(self, image, long_size=None):
+        """Return CRAFT polygons for a BGR image, inferred with its long side at `long_size`."""
+        self.wait_ready()
+        start = time.perf_counter()
+        boxes = self.detector.detect(image, long_size or self.long_size)
+        self.timings["detect"] += time.perf_counter() - start
+        return boxes
+
+    def recognize(self, crops, checkpoint=None):
+        """
+        Recognize Japanese text in [(idx, crop_bgr, coords, hsh), ...].
+
+        Returns (idx, text, coords, hsh) for the crops that passed the filters.
+        `checkpoint` is called between crops and batches and may raise.
+        """
+        self.wait_ready()
+        before = dict(self.timings)
+        # 1) drop English / non-text crops; EasyOCR sees every crop the gate doesn't call Japanese
+        candidates = []
+        for (idx, image, coords, hsh) in crops:
+            if checkpoint:
+                checkpoint()
+            start = time.perf_counter()
+            script = self.script_gate.classify(image)
+            self.timings["gate"] += time.perf_counter() - start
+            if script == NON_TEXT:
+                print(f"[Filter] Script gate classified crop as {script}, skipping")
+                continue
+
+            if script != JAPANESE:
+                start = time.perf_counter()
+                easy_text = " ".join(easyocr_reader.readtext(image, detail=0)).strip()
+                self.timings["easyocr"] += time.perf_counter() - start
+                print("[EasyOCR] easy_text:", easy_text)
+
+                is_english = contains_english_word(easy_text)
+                self.script_gate.record_easyocr(is_english)
+                if is_english:
+                    print("[Filter] EasyOCR detected real English word, skipping")
+                    continue
+            candidates.append((idx, image, coords, hsh))
+        if self.verbose:
+            print("[ScriptGate]", self.script_gate.summary())
+
+        # 2) one batched MangaOCR pass over everything that is left
+        start = time.perf_counter()
+        texts = self.batch_ocr([image for (_, image, _, _) in candidates], checkpoint)
+        self.timings["mangaocr"] += time.perf_counter() - start
+        for stage in ("gate", "easyocr", "mangaocr"):
+            Metrics.observe_stage(stage, self.timings[stage] - before[stage])
+
+        results = []
+        for (idx, image, coords, hsh), text in zip(candidates, texts):
+            text = text or ""
+            print("[MangaOCR] Raw output:", text)
+
+            jp_chars = re.findall(r'[\u3000-\u30FF\u4E00-\u9FFF]', text)
+            en_chars = re.findall(r'[A-Za-z]', text)
+            # print("[Filter] JP count:", len(jp_chars), "EN count:", len(en_chars))
+
+            if len(jp_chars) >= 2 and len(en_chars) <= 1:
+                results.append((idx, text, coords, hsh))
+            else:
+                print("[Filter] Skipped (didn't pass JP/EN threshold)")
+
+        # print(f"[OCR] Extracted {len(results)} Japanese segments")
+        return results
+
+    def summary(self):
+        t = self.timings
+        return f"in-process ({self.detector_kind}) | " + " ".join(f"{k}={v:.2f}s" for k, v in t.items())
+
+    def close(self):
+        pass
+
+
+def contains_english_word(text, min_valid_words=2):
+    tokens = re.findall(r'\b[a-zA-Z]{2,}\b', text.lower())  # only 2+ letter words
+    matches = [word for word in tokens if word in english_vocab]
+    return len(matches) >= min_valid_words
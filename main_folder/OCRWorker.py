@@ -1,97 +1,142 @@
 from PyQt5 import QtWidgets, QtCore, QtGui
-from concurrent.futures import ThreadPoolExecutor
+import threading
 import cv2
-import re
-import mss
 import time
-import imagehash
-import numpy as np
-from PIL import Image
-import hashlib
-import easyocr
-from manga_ocr import MangaOcr
-from craft_text_detector import Craft, craft_utils
-import torch
-print("CUDA Available:", torch.cuda.is_available())
-print("Device:", torch.device("cuda" if torch.cuda.is_available() else "cpu"))
-
-import nltk
-nltk.download('words')
-from nltk.corpus import words
-english_vocab = set(words.words())
-
-mo = MangaOcr()
-easyocr_reader = easyocr.Reader(['en'], gpu=True)
-craft = Craft(output_dir="output", crop_type="box", cuda=torch.cuda.is_available())
-craft_utils.adjustResultCoordinates = lambda polys, ratio_w, ratio_h, ratio_net=2: np.array([
-    np.array(poly) * np.array([ratio_w * ratio_net, ratio_h * ratio_net]) for poly in polys if poly is not None
-])
+from OCREngine import LocalOCREngine
+from ProcessOCREngine import ProcessOCREngine
+from OCRCache import OCRCache
+from DirtyTileDetector import DirtyTileDetector
+from MultiScaleDetector import MultiScaleDetector
+from ScrollTracker import ScrollTracker
+from BoxMerger import merge_boxes, polygons_to_boxes
+from ScreenGrabber import ScreenGrabber
+from FrameChangeDetector import FrameChangeDetector
+from CaptureScheduler import CaptureScheduler
+from FrameMailbox import FrameMailbox, FrameCancelled
+from SessionRecorder import SessionRecorder
+import Metrics
 
 
 class OCRWorker(QtCore.QThread):
     result_ready = QtCore.pyqtSignal(list)
     mini_coords = QtCore.pyqtSignal(list)
 
-    def __init__(self, selector, interval=500):
+    def __init__(self, selector, min_interval=100, max_interval=1000, ocr_batch_size=8, cache_size=2048,
+                 cache_path=None, change_detector=None, max_result_age=1.5, ocr_processes=0,
+                 detector="torch", onnx_threads=0, detect_max_side=None, auto_scale=True, record_path=None,
+                 verbose=False):
         super().__init__()
 
         self.selector = selector
-        self.interval = interval  # milliseconds
         self.running = True
-        # self.previous_hash = None
-        self.last_processed_hash = None  # Only updated after OCR/translation
-        self.executor = ThreadPoolExecutor(max_workers=2)
+        # Capture rate follows screen activity; a waiting frame is replaced, never waited on
+        self.scheduler = CaptureScheduler(min_interval=min_interval, max_interval=max_interval, max_in_flight=2,
+                                          verbose=verbose)
+        # Single source of truth for "has the screen changed since the last processed frame"
+        self.change_detector = change_detector or FrameChangeDetector()
+        # Latest frame wins: a new capture replaces the waiting one and cancels the running one
+        self.mailbox = FrameMailbox()
+        self.consumer = None
+        self.grabber = ScreenGrabber()
         self.last_emit_time = 0  # track latest displayed frame
+        # Stale frames still finish if nothing has been shown for this long, so
+        # continuous scrolling can't cancel every frame
+        self.max_result_age = max_result_age
 
-        self.last_hash      = None
-        self.hash_threshold = 5
-        self.force_refresh  = False
         self.skip_next_run = False
-        self.ocr_cache = {}
+        self.ocr_cache = OCRCache(max_entries=cache_size, db_path=cache_path)
+        # ocr_processes > 0 moves detection and recognition into a process pool
+        engine_options = {"ocr_batch_size": ocr_batch_size, "detector": detector, "onnx_threads": onnx_threads,
+                          "verbose": verbose}
+        if ocr_processes:
+            self.engine = ProcessOCREngine(processes=ocr_processes, **engine_options)
+        else:
+            self.engine = LocalOCREngine(**engine_options)
+        # Detection runs downscaled (capped long side, auto scale from glyph size); boxes come back at full resolution
+        self.scaled_detector = MultiScaleDetector(self.detect_text_regions, auto_scale=auto_scale,
+                                                  max_long_side=detect_max_side or self.engine.long_size)
+        self.tile_detector = DirtyTileDetector(self.scaled_detector)
+        self.scroll_tracker = ScrollTracker(max_key_distance=self.ocr_cache.max_distance)
+        # Every captured frame goes to this session file, for replaying later
+        self.recorder = SessionRecorder(record_path) if record_path else None
 
         self.latest_text = []
-
-        self.last_submit_timestamp = 0
+        # Per-frame component summaries on stdout
+        self.verbose = verbose
+        # Optional callable(stage, seconds), e.g. the replay harness's timers
+        self.stage_observer = None
+        self.register_metrics()
 
     def run(self):
+        self.consumer = threading.Thread(target=self._consume_frames, name="OCRFrameConsumer", daemon=True)
+        self.consumer.start()
         while self.running:
             
             if self.skip_next_run:
                 self.skip_next_run = False
-                self.msleep(self.interval)
+                self.msleep(self.scheduler.delay())
+                continue
+
+            # Backpressure counts only frames being processed; a waiting frame
+            # is replaced by this capture rather than left to age in the slot
+            if not self.scheduler.can_submit(self.mailbox.processing()):
+                self.msleep(self.scheduler.min_interval)
                 continue
 
             bbox = self.selector.get_bbox()
-            start_hash_time = time.time()
+            stage_start = time.perf_counter()
             image = self.capture_screen(bbox)
-            # print(f"[{threading.current_thread().name}] [Timing] Screen capture took {time.time() - start_hash_time:.4f} seconds", flush=True)
-
-            # Compare current screenshot with previous using perceptual hash
-            start_hash_time = time.time()
-            current_hash = imagehash.phash(image)
-            # hash_diff = abs(current_hash - self.previous_hash) if self.previous_hash else 999
-            hash_diff = abs(current_hash - self.last_processed_hash) if self.last_processed_hash else 999
-            # print("[Timing] pHash comparison took {:.4f} seconds".format(time.time() - start_hash_time), flush=True)
-            # print("[pHash] Difference from previous frame:", hash_diff, flush=True)
-
-            if self.last_processed_hash is not None and hash_diff <= 1 and not self.force_refresh_flag:
-                print("Hashing here")
-                self.msleep(self.interval)
+            stage_start = self.record_stage("capture", stage_start)
+            if self.recorder:
+                self.recorder.add(image, time.time(), bbox)
+
+            # Compare against the last processed frame: sparse pixel check first, pHash if unsure
+            changed, signature = self.change_detector.check(image)
+            self.record_stage("hash", stage_start)
+
+            self.scheduler.on_frame(changed)
+            if not changed:
+                self.msleep(self.scheduler.delay())
                 continue
 
-            self.previous_hash = current_hash
-            self.force_refresh_flag = False
-            timestamp = time.time()
-            self.last_submit_timestamp = timestamp
-            try:
-                self.executor.submit(self.process_frame, image.copy(), timestamp)
-            except RuntimeError:
-                print("[Thread] Executor is shut down — exiting run loop.")
-                break
+            self.change_detector.accept(signature, image)
+            if self.verbose:
+                print("[ChangeDetector]", self.change_detector.summary())
 
             # Process screenshot asynchronously
-            # self.executor.submit(self.process_frame, image.copy(), timestamp)
-            self.msleep(self.interval)
+            self.mailbox.put(image, time.time())
+            self.msleep(self.scheduler.delay())
+
+    def _consume_frames(self):
+        while True:
+            item = self.mailbox.take()
+            if item is None:
+                print("[Thread] Mailbox closed — exiting frame consumer.")
+                return
+            generation, image, timestamp, force = item
+            cancelled = failed = False
+            try:
+                self.process_frame(image, timestamp, force, generation)
+            except FrameCancelled:
+                cancelled = True
+                if self.verbose:
+                    print("[Mailbox] Abandoned stale frame:", self.mailbox.summary())
+            except Exception as e:
+                # Only this frame is lost; the consumer keeps going
+                failed = True
+                print("[OCRWorker] Frame failed:", repr(e), flush=True)
+            finally:
+                self.mailbox.done(cancelled=cancelled, force=force, failed=failed)
+
+    def checkpoint(self, generation):
+        """Raise FrameCancelled if a newer frame is waiting (cooperative cancellation)."""
+        if generation is not None and self.mailbox.closed:
+            raise FrameCancelled()  # shutting down, don't finish the frame
+        if generation is None or not self.mailbox.is_stale(generation):
+            return
+        if time.time() - self.last_emit_time > self.max_result_age:
+            return
+        raise FrameCancelled()
 
     # def force_translate_now(self):
     #     gc.collect()
@@ -131,62 +176,88 @@ class OCRWorker(QtCore.QThread):
     def force_capture(self):
         bbox = self.selector.get_bbox()
         image = self.capture_screen(bbox)
-        self.force_refresh = True
+        if self.recorder:
+            self.recorder.add(image, time.time(), bbox)
+        _, signature = self.change_detector.check(image)
+        self.change_detector.accept(signature, image)
         self.skip_next_run = True
-        timestamp = time.time()
-        try:
-            self.executor.submit(self.process_frame, image.copy(), timestamp)
-        except RuntimeError:
-            print("[Thread] Executor is shut down — exiting run loop.")
+        self.mailbox.put(image, time.time(), force=True)
 
 
-    def process_frame(self, image, timestamp):
-        if timestamp < self.last_submit_timestamp:
-            return
-        
-        # 1) frame-level pHash skip
-
-        pil_img = image.convert("RGB")
-        frame_hash = imagehash.phash(pil_img)
-        if (self.last_hash is not None
-            and abs(frame_hash - self.last_hash) <= self.hash_threshold
-            and not self.force_refresh):
-            return
-        self.last_hash     = frame_hash
+    def process_frame(self, image, timestamp, force=False, generation=None):
+        self.checkpoint(generation)
+        frame_start = stage_start = time.perf_counter()
+
+        # 1) unchanged frames were already dropped by the change detector in run()
+        # `image` is the BGR frame from ScreenGrabber; it and its grayscale copy
+        # are the only full-frame buffers for the rest of the pipeline
+        frame_bgr  = image
+        frame_gray = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY)
 
         # 2) detect & crop in-memory
-        frame_bgr  = cv2.cvtColor(np.array(pil_img), cv2.COLOR_RGB2BGR)
-        raw_boxes  = self.detect_text_regions(frame_bgr)                  # [(x1,y1,x2,y2),…]
+        if force:
+            self.tile_detector.reset()
+            self.scroll_tracker.reset()
+        # Scrolling moves the reference frame and the tracked lines along with
+        # the content, so only the newly revealed strip is detected and OCR'd
+        shift = self.scroll_tracker.estimate(frame_gray)
+        if shift:
+            self.tile_detector.shift(*shift)
+        raw_boxes  = self.tile_detector.detect(frame_bgr, frame_gray)     # [(x1,y1,x2,y2),…]
+        stage_start = self.record_stage("detect", stage_start)
+        self.checkpoint(generation)
         crops      = self.crop_text_regions(frame_bgr, raw_boxes)         # [(np.ndarray,(x,y,w,h)),…]
+        stage_start = self.record_stage("crop", stage_start)
 
         # 3) prepare placeholders for EXACTLY len(crops)
         jp_texts   = [None] * len(crops)
         coords_out = [None] * len(crops)
-        to_ocr     = []   # will hold (index, PIL_image, coords, hsh)
+        to_ocr     = []   # will hold (index, crop_bgr, coords, hsh)
+        keys       = []
+        thumbs     = []   # OCRCache thumbnails, which confirm a hash match
 
         for idx, (crop_bgr, (x, y, w, h)) in enumerate(crops):
-            hsh = hashlib.sha1(crop_bgr.tobytes()).hexdigest()
+            hsh, thumb = self.ocr_cache.describe(crop_bgr)
             coords = (x, y, w, h)
-
-            if (hsh in self.ocr_cache) and not self.force_refresh:
-                jp_texts[idx]   = self.ocr_cache[hsh]
+            keys.append(hsh)
+            thumbs.append(thumb)
+
+            # A line that only scrolled keeps its text; anything else asks the cache
+            cached = None
+            if not force:
+                cached = self.scroll_tracker.lookup(coords, hsh, thumb)
+                if cached is None:
+                    cached = self.ocr_cache.get(hsh, thumb)
+            if cached is not None:
+                jp_texts[idx]   = cached
                 coords_out[idx] = coords
-                print("Image seen before")
             else:
-                pil = Image.fromarray(cv2.cvtColor(crop_bgr, cv2.COLOR_BGR2RGB))
-                to_ocr.append((idx, pil, coords, hsh))
+                to_ocr.append((idx, crop_bgr, coords, hsh))
 
-        print("1. Force Refresh:", self.force_refresh)
-        self.force_refresh = False
-        print("2. Force Refresh:", self.force_refresh)
+        stage_start = self.record_stage("cache", stage_start)
+        self.checkpoint(generation)
 
         # 4) OCR the genuinely new ones and slot them back in place
-        if to_ocr:
-            extracted = self.extract_japanese_text_from_regions(to_ocr)
+        extracted = self.extract_japanese_text_from_regions(to_ocr, lambda: self.checkpoint(generation)) if to_ocr else []
+        self.record_stage("ocr", stage_start)
         for idx, jp, coord, hsh in extracted:
-            self.ocr_cache[hsh] = jp
+            self.ocr_cache.put(hsh, jp, thumbs[idx])
             jp_texts[idx]       = jp
             coords_out[idx]     = coord
+        # Remember rejected crops too (English, non-text, failed the JP filter)
+        # so they are not OCR'd again on every frame
+        for idx, _, _, hsh in to_ocr:
+            if jp_texts[idx] is None:
+                self.ocr_cache.put(hsh, "", thumbs[idx])
+        self.ocr_cache.flush()
+        self.scroll_tracker.update([(coords, hsh, thumbs[idx], jp_texts[idx] or "")
+                                    for idx, ((_, coords), hsh) in enumerate(zip(crops, keys))])
+        if self.verbose:
+            print("[DirtyTiles]", self.tile_detector.summary())
+            print("[DetectScale]", self.scaled_detector.summary())
+            print("[OCRCache]", self.ocr_cache.summary())
+            print("[ScrollTracker]", self.scroll_tracker.summary())
+            print("[OCREngine]", self.engine.summary())
 
         # 5) now filter out any blanks and emit — order is intact
         final_jps   = []
@@ -205,94 +276,68 @@ class OCRWorker(QtCore.QThread):
             sorted_coords, sorted_jps = zip(*paired)
         else:
             sorted_coords, sorted_jps = [], []
-        
+
+        self.checkpoint(generation)
+        self.record_stage("frame", frame_start)
+        self.last_emit_time = time.time()
+        Metrics.caption_started(sorted_jps, timestamp)
         self.mini_coords.emit(list(sorted_coords))
         self.result_ready.emit(list(sorted_jps))
 
-    def capture_screen(self, bbox):
-        with mss.mss() as sct:
-            monitor = {
-                "top": int(bbox[1]),
-                "left": int(bbox[0]),
-                "width": int(bbox[2] - bbox[0]),
-                "height": int(bbox[3] - bbox[1])
-            }
-            sct_img = sct.grab(monitor)
-            return Image.frombytes("RGB", sct_img.size, sct_img.rgb)
-
-    # Can speed up using DBNet over craft-text-detector
-    # def detect_text_regions(self, image):
-    #     image.save("temp.png")
-    #     prediction = craft.detect_text("temp.png")
-    #     return [box for box in prediction["boxes"] if box is not None and len(box) == 4]
-
-    def detect_text_regions(self, image):
-        # print("[Debug] detect_text_regions() called", flush=True)
-        image_cv = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
-        prediction = craft.detect_text(image_cv)
-        
-        boxes = [box for box in prediction["boxes"] if box is not None and len(box) == 4]
-        # print(f"[Craft] Detected {len(boxes)} boxes")
-        return boxes
+    def record_stage(self, stage, start):
+        """Report the time since `start` to the metrics and the stage observer; returns now, the next stage's start."""
+        now = time.perf_counter()
+        Metrics.observe_stage(stage, now - start)
+        if self.stage_observer:
+            self.stage_observer(stage, now - start)
+        return now
+
+    def register_metrics(self):
+        # Read from the components' own stats at scrape time
+        Metrics.gauge("rtocr_queue_depth", "Items waiting or in progress per queue",
+                      self.mailbox.in_flight, queue="frames")
+        Metrics.gauge("rtocr_capture_interval_ms", "Current capture interval", self.scheduler.delay)
+
+        def cache_ratio():
+            s = self.ocr_cache.stats()
+            lookups = s["hits"] + s["near_hits"] + s["disk_hits"] + s["misses"]
+            return (lookups - s["misses"]) / lookups if lookups else 0.0
+
+        def scroll_ratio():
+            s = self.scroll_tracker.stats
+            return s["reused"] / (s["reused"] + s["new"]) if s["reused"] + s["new"] else 0.0
+
+        def unchanged_ratio():
+            s = self.scheduler.stats
+            return s["idle"] / (s["idle"] + s["changed"]) if s["idle"] + s["changed"] else 0.0
+
+        Metrics.gauge("rtocr_hit_ratio", "Share of lookups served without OCR", cache_ratio, cache="ocr")
+        Metrics.gauge("rtocr_hit_ratio", "Share of lookups served without OCR", scroll_ratio, cache="scroll")
+        Metrics.gauge("rtocr_hit_ratio", "Share of lookups served without OCR", unchanged_ratio, cache="unchanged_frames")
+
+        help_text = "Frames by what happened to them"
+        Metrics.counter("rtocr_frames_total", help_text, lambda: self.scheduler.stats["idle"], outcome="unchanged")
+        Metrics.counter("rtocr_frames_total", help_text, lambda: self.scheduler.stats["throttled"], outcome="throttled")
+        for outcome in ("submitted", "replaced", "cancelled", "completed", "failed"):
+            Metrics.counter("rtocr_frames_total", help_text,
+                            lambda outcome=outcome: self.mailbox.stats[outcome], outcome=outcome)
 
+    def capture_screen(self, bbox):
+        return self.grabber.grab_bgr(bbox)
 
+    def detect_text_regions(self, image, long_size=None):
+        # print("[Debug] detect_text_regions() called", flush=True)
+        return self.engine.detect(image, long_size)
 
     def crop_text_regions(self, image, bboxes):
         # if os.path.exists("cropped_images"):
         #     shutil.rmtree("cropped_images")
         # os.makedirs("cropped_images")
 
-        def polygon_to_bbox(poly):
-            points = np.array(poly, dtype=np.int32)
-            x_min, y_min = points.min(axis=0)
-            x_max, y_max = points.max(axis=0)
-            return [x_min, y_min, x_max, y_max]
-
-        def merge_boxes(boxes, x_thresh, y_thresh):
-            def boxes_are_close(a, b):
-                return not (
-                    b[2] < a[0] - x_thresh or
-                    b[0] > a[2] + x_thresh or
-                    b[3] < a[1] - y_thresh or
-                    b[1] > a[3] + y_thresh
-                )
-
-            # Track bounding boxes of entire groups instead of each inner box
-            group_bounds = []  # merged representative of each group
-            groups = []
-
-            for box in boxes:
-                matched = False
-                for i, bound in enumerate(group_bounds):
-                    if boxes_are_close(box, bound):
-                        groups[i].append(box)
-                        # Update bounding box for future comparisons
-                        x1 = min(bound[0], box[0])
-                        y1 = min(bound[1], box[1])
-                        x2 = max(bound[2], box[2])
-                        y2 = max(bound[3], box[3])
-                        group_bounds[i] = [x1, y1, x2, y2]
-                        matched = True
-                        break
-                if not matched:
-                    groups.append([box])
-                    group_bounds.append(box[:])  # make a copy
-
-            merged = group_bounds  # each bound is already the merged box
-            return merged
-
-
-        start_merge = time.time()
-        boxes = [polygon_to_bbox(b) for b in bboxes]
-        boxes = merge_boxes(boxes, x_thresh=10, y_thresh=1)
-        # print("[Timing] Merging boxes took {:.4f} seconds".format(time.time() - start_merge))
-
-
-        start_merge = time.time()
-        image_cv = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+        boxes = merge_boxes(polygons_to_boxes(bboxes), x_thresh=10, y_thresh=1)
+
+        image_cv = image
         cropped = []
-        global caption_boxes
-        caption_boxes = []
         bbox = self.selector.get_bbox()  # (left, top, right, bottom)
         left, top, right, bottom = bbox
         for i, box in enumerate(boxes):
@@ -307,63 +352,36 @@ class OCRWorker(QtCore.QThread):
             width = x2_global - x1_global
             height = y2_global - y1_global
 
-            # mini_box = MiniCaptionBox(x1_global, y1_global, width, height, text="")
-            # mini_box.make_click_through()
-            # caption_boxes.append(mini_box)
-
-            crop = image_cv[y1:y2, x1:x2]
+            crop = image_cv[y1:y2, x1:x2]  # view into the frame, no copy
             # pil = Image.fromarray(cv2.cvtColor(crop, cv2.COLOR_BGR2RGB))
             # pil.save(f"cropped_images/cropped_{i}.png")
             # cropped.append((pil, box))
             cropped.append((crop, (x1_global, y1_global, width, height)))
-        # print("[Timing] Cropped boxes took {:.4f} seconds".format(time.time() - start_merge))
         return cropped
 
-    def extract_japanese_text_from_regions(self, crops):
-        local_boxes = []
-        results = []
-        for (idx, image, (x1_global, y1_global, width, height), hsh) in crops:
-            np_img = np.array(image.convert('RGB'))
-            easy_text = " ".join(easyocr_reader.readtext(np_img, detail=0)).strip()
-            print("[EasyOCR] easy_text:", easy_text)
-
-            # if re.search(r'[A-Za-z]{4,}', easy_text):
-            #     print("[Filter] EasyOCR detected English-like text, skipping")
-            #     # results.append("")
-            #     continue
-            if contains_english_word(easy_text):
-                print("[Filter] EasyOCR detected real English word, skipping")
-                continue
-
-            text = mo(image) or ""
-            print("[MangaOCR] Raw output:", text)
-
-            jp_chars = re.findall(r'[\u3000-\u30FF\u4E00-\u9FFF]', text)
-            en_chars = re.findall(r'[A-Za-z]', text)
-            # print("[Filter] JP count:", len(jp_chars), "EN count:", len(en_chars))
-
-            if len(jp_chars) >= 2 and len(en_chars) <= 1:
-                results.append((idx, text, (x1_global, y1_global, width, height), hsh))
-
-                # local_boxes.append(BoxInfo(x1_global, y1_global, width, height, jp_text=text, en_text=""))
-                local_boxes.append((x1_global, y1_global, width, height))
-                # mini_box = MiniCaptionBox(x1_global, y1_global, width, height)
-                # mini_box.make_click_through()
-                # caption_boxes.append(mini_box)
-            else:
-                print("[Filter] Skipped (didn't pass JP/EN threshold)")
-
-        # print(f"[OCR] Extracted {len(results)} Japanese segments")
-        return results
+    def extract_japanese_text_from_regions(self, crops, checkpoint=None):
+        return self.engine.recognize(crops, checkpoint)
     
     def shutdown_now(self):
         print("[Mini][Exit] Shutting down OCRWorker immediately.")
         self.running = False
-        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.mailbox.close()
+        # Stop both threads before releasing what they use: the grabber's mss
+        # handles and the engine/cache may be mid-call otherwise.
+        # run() sleeps at most one capture interval between checks of `running`
+        if not self.wait(int(self.scheduler.max_interval) + 2000):
+            print("[Mini][Exit] Capture thread still running, leaving the grabber open.")
+            return
+        self.grabber.close()
+        if self.recorder:
+            self.recorder.close()
+        # The consumer checks the closed mailbox between stages; a model still
+        # warming up can hold it longer, then the process exit takes it down
+        if self.consumer is not None:
+            self.consumer.join(timeout=10)
+            if self.consumer.is_alive():
+                print("[Mini][Exit] Frame consumer still busy, leaving the engine open.")
+                return
+        self.engine.close()
+        self.ocr_cache.close()
         self.quit()
-
-
-def contains_english_word(text, min_valid_words=2):
-    tokens = re.findall(r'\b[a-zA-Z]{2,}\b', text.lower())  # only 2+ letter words
-    matches = [word for word in tokens if word in english_vocab]
-    return len(matches) >= min_valid_words
\ No newline at end of file
@@ -0,0 +1,228 @@
+import os
+import threading
+import time
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from multiprocessing import shared_memory
+import numpy as np
+import Metrics
+import StartupTimer
+from OCREngine import CRAFT_LONG_SIZE
+
+# Per-worker-process state
+_engine = None
+_blocks = {}  # arena name -> SharedMemory, least recently used first
+_MAX_BLOCKS = 4
+
+
+def _init_worker(engine_options):
+    # Models load once per worker process, not per task
+    global _engine
+    from OCREngine import LocalOCREngine
+    _engine = LocalOCREngine(**engine_options)
+
+
+def _view(name, offset, shape):
+    shm = _blocks.pop(name, None)
+    if shm is None:
+        shm = shared_memory.SharedMemory(name=name)
+    _blocks[name] = shm
+    # The parent takes turns between a few arenas and drops outgrown ones;
+    # mappings of arenas not used for a while go
+    while len(_blocks) > _MAX_BLOCKS:
+        _blocks.pop(next(iter(_blocks))).close()
+    return np.ndarray(shape, dtype=np.uint8, buffer=shm.buf, offset=offset)
+
+
+def _run(fn):
+    start = time.perf_counter()
+    before = dict(_engine.timings)
+    result = fn()
+    stages = {k: v - before[k] for k, v in _engine.timings.items()}
+    return os.getpid(), time.perf_counter() - start, stages, result
+
+
+def _ping():
+    _engine.wait_ready()
+    return _run(lambda: _engine.long_size)
+
+
+def _detect(name, shape, long_size):
+    return _run(lambda: _engine.detect(_view(name, 0, shape), long_size))
+
+
+def _recognize(name, items):
+    crops = [(idx, _view(name, offset, shape), coords, hsh) for (idx, offset, shape, coords, hsh) in items]
+    return _run(lambda: _engine.recognize(crops))
+
+
+class ProcessOCREngine:
+    """
+    Runs LocalOCREngine in a pool of worker processes, out of the GUI
+    process's GIL.
+
+    Each worker loads the models once. Images go through shared-memory
+    arenas (the parent copies the region or the crops in, workers map them)
+    instead of being pickled. An arena is only reused once every task given
+    it has finished, so a chunk of a cancelled frame that is still running
+    never reads the next frame's crops. A frame's crops are split across all
+    workers.
+    With CUDA every worker holds its own copy of the models on the GPU.
+    """
+
+    def __init__(self, processes=2, poll_interval=0.05, **engine_options):
+        # engine_options are LocalOCREngine's arguments, for every worker
+        self.processes = processes
+        self.long_size = CRAFT_LONG_SIZE
+        self.poll_interval = poll_interval
+        self.executor = ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=mp.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(engine_options,),
+        )
+        self.arenas = []  # free SharedMemory blocks
+        self.lent = {}    # arena name -> (SharedMemory, futures still reading it)
+        self.start_time = time.perf_counter()
+        self.procs = {}  # pid -> {"tasks", "busy", "stages"}
+        self.parent = {"copy": 0.0, "wait": 0.0}
+        # Start the workers now so the models load while the app comes up
+        self.warming_up = processes
+        self.warmup_lock = threading.Lock()
+        self.warmup = [self.executor.submit(_ping) for _ in range(processes)]
+        for future in self.warmup:
+            future.add_done_callback(self._on_warm)
+
+    def wait_ready(self):
+        for future in self.warmup:
+            future.result()
+
+    def detect(self, image, long_size=None):
+        arena, _ = self._pack([image])
+        future = self.executor.submit(_detect, arena.name, image.shape, long_size)
+        self._lend(arena, [future])
+        start = time.perf_counter()
+        boxes = self._collect(future)
+        self.parent["wait"] += time.perf_counter() - start
+        return boxes
+
+    def recognize(self, crops, checkpoint=None):
+        if not crops:
+            return []
+        if checkpoint:
+            checkpoint()
+        arena, offsets = self._pack([image for (_, image, _, _) in crops])
+
+        # Largest crops first, each to the least loaded chunk
+        chunks = [[] for _ in range(min(self.processes, len(crops)))]
+        loads = [0] * len(chunks)
+        order = sorted(range(len(crops)), key=lambda i: -crops[i][1].size)
+        for i in order:
+            idx, image, coords, hsh = crops[i]
+            k = loads.index(min(loads))
+            chunks[k].append((idx, offsets[i], image.shape, coords, hsh))
+            loads[k] += image.size
+
+        pending = {self.executor.submit(_recognize, arena.name, chunk) for chunk in chunks}
+        self._lend(arena, pending)
+        results = []
+        start = time.perf_counter()
+        try:
+            while pending:
+                if checkpoint:
+                    checkpoint()
+                done, pending = wait(pending, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results.extend(self._collect(future))
+        except BaseException:
+            # Chunks that already started finish in the background (the arena
+            # stays lent to them); their results are dropped
+            for future in pending:
+                future.cancel()
+            raise
+        finally:
+            self.parent["wait"] += time.perf_counter() - start
+        results.sort(key=lambda r: r[0])
+        return results
+
+    def summary(self):
+        wall = time.perf_counter() - self.start_time
+        parts = [f"{len(self.procs)}/{self.processes} procs"]
+        for pid, p in sorted(self.procs.items()):
+            stages = " ".join(f"{k}={v:.2f}s" for k, v in p["stages"].items())
+            parts.append(f"pid {pid}: {p['busy'] / wall:.0%} busy, {p['tasks']} tasks ({stages})")
+        parts.append(f"parent: copy={self.parent['copy']:.2f}s wait={self.parent['wait']:.2f}s")
+        return " | ".join(parts)
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        for arena in self.arenas + [arena for arena, _ in self.lent.values()]:
+            _free(arena)
+        self.arenas = []
+        self.lent = {}
+
+    def _pack(self, arrays):
+        # Copy the arrays back to back into a free arena; returns (arena, offsets).
+        # The arena counts as lent (to no task yet) until _lend() names its tasks
+        start = time.perf_counter()
+        self._reclaim()
+        total = sum(a.nbytes for a in arrays)
+        arena = next((a for a in self.arenas if a.size >= total), None)
+        if arena is not None:
+            self.arenas.remove(arena)
+        else:
+            # Every free arena is too small (or all are lent): drop the small
+            # ones and add one, doubling when the frame outgrew all of them
+            largest = max([a.size for a in self.arenas] + [a.size for a, _ in self.lent.values()], default=0)
+            for old in self.arenas:
+                _free(old)
+            self.arenas = []
+            size = max(total, 2 * largest) if total > largest else largest
+            arena = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        self.lent[arena.name] = (arena, [])
+
+        offsets = []
+        offset = 0
+        for a in arrays:
+            np.ndarray(a.shape, dtype=np.uint8, buffer=arena.buf, offset=offset)[...] = a
+            offsets.append(offset)
+            offset += a.nbytes
+        self.parent["copy"] += time.perf_counter() - start
+        return arena, offsets
+
+    def _lend(self, arena, futures):
+        self.lent[arena.name][1].extend(futures)
+
+    def _reclaim(self):
+        # Arenas whose tasks have all finished (or were cancelled before starting) are free again
+        for name, (arena, futures) in list(self.lent.items()):
+            if all(f.done() for f in futures):
+                del self.lent[name]
+                self.arenas.append(arena)
+
+    def _on_warm(self, future):
+        with self.warmup_lock:
+            self.warming_up -= 1
+            if self.warming_up:
+                return
+        StartupTimer.mark(f"{self.processes} OCR worker processes ready")
+        StartupTimer.report()
+
+    def _collect(self, future):
+        pid, busy, stages, result = future.result()
+        p = self.procs.setdefault(pid, {"tasks": 0, "busy": 0.0, "stages": {}})
+        p["tasks"] += 1
+        p["busy"] += busy
+        for k, v in stages.items():
+            p["stages"][k] = p["stages"].get(k, 0.0) + v
+        # The workers' own metrics never leave their process; recognition is
+        # recorded here per chunk (detection is timed by OCRWorker)
+        if "mangaocr" in stages and stages["mangaocr"] > 0:
+            for stage in ("gate", "easyocr", "mangaocr"):
+                Metrics.observe_stage(stage, stages[stage])
+        return result
+
+
+def _free(arena):
+    arena.close()
+    arena.unlink()
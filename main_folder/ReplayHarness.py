@@ -0,0 +1,220 @@
+"""
+Headless replay of recorded frames through the OCR pipeline.
+
+    python ReplayHarness.py run FRAMES [--out run.json]
+    python ReplayHarness.py compare base.json new.json
+
+FRAMES is a directory of PNG/JPG frames (replayed in name order), a
+session recorded with main.py --record, or a screen recording any OpenCV
+build can read. Every frame goes through the
+same stages as a live session, minus the screen capture: change check ->
+detect -> crop -> cache -> OCR -> translate. Translation uses a local stub,
+so runs need no network and are repeatable. The report holds per-stage
+latency percentiles, throughput and cache hit rates; compare flags stages
+and rates that got worse between two reports.
+"""
+import argparse
+import contextlib
+import glob
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+import cv2
+import numpy as np
+from SessionRecorder import SessionReader, is_session
+
+
+class HeadlessSelector:
+    """Stands in for ScreenSelector: the capture box is the whole replayed frame."""
+
+    def __init__(self):
+        self.bbox = (0, 0, 0, 0)
+
+    def get_bbox(self):
+        return self.bbox
+
+
+def make_stub_translator(latency=0.0):
+    """A TranslateWorker whose backend tags each line instead of calling Google."""
+    from TranslateWorker import TranslateWorker
+    from TranslationBackend import StubBackend
+    return TranslateWorker(backend=StubBackend(latency))
+
+
+def iter_frames(source):
+    if os.path.isdir(source):
+        paths = sorted(glob.glob(os.path.join(source, "*.png")) + glob.glob(os.path.join(source, "*.jpg")))
+        for path in paths:
+            yield cv2.imread(path, cv2.IMREAD_COLOR)
+        return
+    if is_session(source):
+        reader = SessionReader(source)
+        try:
+            yield from reader
+        finally:
+            reader.close()
+        return
+    cap = cv2.VideoCapture(source)
+    try:
+        while True:
+            ok, frame = cap.read()
+            if not ok:
+                return
+            yield frame
+    finally:
+        cap.release()
+
+
+def percentiles(samples):
+    ms = np.asarray(samples) * 1000
+    return {
+        "count": len(ms),
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p90_ms": float(np.percentile(ms, 90)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "max_ms": float(ms.max()),
+    }
+
+
+def replay(source, limit=None, translate_latency=0.0, quiet=True, **worker_options):
+    from OCRWorker import OCRWorker
+
+    selector = HeadlessSelector()
+    worker = OCRWorker(selector, verbose=not quiet, **worker_options)
+    timings = defaultdict(list)
+    worker.stage_observer = lambda stage, seconds: timings[stage].append(seconds)
+    results = []
+    worker.result_ready.connect(results.append)
+    translator = make_stub_translator(translate_latency)
+    lines = [0]
+    translator.translated.connect(lambda jp, en: lines.__setitem__(0, lines[0] + len(en)))
+
+    start = time.perf_counter()
+    worker.engine.wait_ready()
+    warmup = time.perf_counter() - start
+
+    frames = processed = 0
+    wall_start = time.perf_counter()
+    with open(os.devnull, "w") as devnull, \
+            contextlib.redirect_stdout(devnull) if quiet else contextlib.nullcontext():
+        for frame in iter_frames(source):
+            if limit is not None and frames >= limit:
+                break
+            frames += 1
+            h, w = frame.shape[:2]
+            selector.bbox = (0, 0, w, h)
+
+            stage_start = time.perf_counter()
+            changed, signature = worker.change_detector.check(frame)
+            worker.scheduler.on_frame(changed)
+            timings["hash"].append(time.perf_counter() - stage_start)
+            if not changed:
+                continue
+            worker.change_detector.accept(signature, frame)
+
+            worker.process_frame(frame, time.time())
+            processed += 1
+
+            stage_start = time.perf_counter()
+            translator.translate_texts(results[-1])
+            timings["translate"].append(time.perf_counter() - stage_start)
+    wall = time.perf_counter() - wall_start
+
+    cache = worker.ocr_cache.stats()
+    lookups = cache["hits"] + cache["near_hits"] + cache["disk_hits"] + cache["misses"]
+    reused = worker.scroll_tracker.stats["reused"]
+    crops = lookups + reused
+    report = {
+        "source": os.path.abspath(source),
+        "frames": frames,
+        "processed": processed,
+        "warmup_s": warmup,
+        "wall_s": wall,
+        "throughput": {
+            "frames_per_s": frames / wall if wall else 0.0,
+            "processed_per_s": processed / wall if wall else 0.0,
+            "crops_per_s": crops / wall if wall else 0.0,
+        },
+        "stages": {stage: percentiles(samples) for stage, samples in timings.items() if samples},
+        "hit_rates": {
+            "unchanged_frames": 1 - processed / frames if frames else 0.0,
+            "ocr_cache": (lookups - cache["misses"]) / lookups if lookups else 0.0,
+            "scroll_tracker": reused / crops if crops else 0.0,
+            "translation_reuse": 1 - translator.backend.sent / lines[0] if lines[0] else 0.0,
+        },
+        "counters": {
+            "crops": crops,
+            "ocr_cache": cache,
+            "scroll_tracker": dict(worker.scroll_tracker.stats),
+            "change_detector": dict(worker.change_detector.stats),
+            "tiles": dict(worker.tile_detector.stats),
+        },
+    }
+    worker.shutdown_now()
+    return report
+
+
+def compare(base, new, tolerance=0.10, min_ms=1.0, min_rate_drop=0.05):
+    """Return the regressions of `new` against `base` (two replay reports) as readable lines."""
+    regressions = []
+    for stage in sorted(set(base["stages"]) & set(new["stages"])):
+        for q in ("p50_ms", "p90_ms", "p99_ms"):
+            b, n = base["stages"][stage][q], new["stages"][stage][q]
+            if n > b * (1 + tolerance) and n - b >= min_ms:
+                regressions.append(f"{stage} {q[:-3]}: {b:.1f} -> {n:.1f} ms (+{(n / b - 1) if b else 1:.0%})")
+    for key, b in base["throughput"].items():
+        n = new["throughput"].get(key, 0.0)
+        if n < b * (1 - tolerance):
+            regressions.append(f"{key}: {b:.2f} -> {n:.2f} ({n / b - 1:.0%})")
+    for key, b in base["hit_rates"].items():
+        n = new["hit_rates"].get(key, 0.0)
+        if b - n >= min_rate_drop:
+            regressions.append(f"{key} hit rate: {b:.1%} -> {n:.1%}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run")
+    run.add_argument("source", help="directory of PNG/JPG frames, a recorded session, or a video file")
+    run.add_argument("--out", help="write the JSON report here (default: stdout)")
+    run.add_argument("--limit", type=int, help="stop after this many frames")
+    run.add_argument("--translate-latency", type=float, default=0.0, help="seconds the stub waits per batch")
+    run.add_argument("--ocr-processes", type=int, default=0)
+    run.add_argument("--detector", choices=["torch", "onnx"], default="torch")
+    run.add_argument("--verbose", action="store_true", help="keep the pipeline's own logging")
+
+    cmp = sub.add_parser("compare")
+    cmp.add_argument("base")
+    cmp.add_argument("new")
+    cmp.add_argument("--tolerance", type=float, default=0.10, help="allowed relative slowdown")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        report = replay(args.source, limit=args.limit, translate_latency=args.translate_latency,
+                        quiet=not args.verbose, ocr_processes=args.ocr_processes, detector=args.detector)
+        text = json.dumps(report, indent=2)
+        if args.out:
+            with open(args.out, "w") as f:
+                f.write(text)
+            s = report["stages"].get("frame")
+            print(f"[Replay] {report['processed']}/{report['frames']} frames processed, "
+                  f"{report['throughput']['processed_per_s']:.2f} frames/s, "
+                  f"frame p50 {s['p50_ms'] if s else 0:.0f} ms -> {args.out}")
+        else:
+            print(text)
+    else:
+        with open(args.base) as f:
+            base = json.load(f)
+        with open(args.new) as f:
+            new = json.load(f)
+        regressions = compare(base, new, tolerance=args.tolerance)
+        for line in regressions:
+            print("[Regression]", line)
+        print(f"[Compare] {len(regressions)} regression(s)")
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,134 @@
+import threading
+import cv2
+import mss
+import numpy as np
+
+
+class ScreenGrabber:
+    """
+    Long-lived screen grabber.
+
+    Opening mss per capture re-creates the device contexts every frame, so each
+    thread keeps its own mss instance (the handles belong to the thread that
+    created them). Frames come back as NumPy arrays over the grab buffer instead
+    of going through PIL.
+    """
+
+    def __init__(self):
+        self.local = threading.local()
+        self.instances = []
+        self.lock = threading.Lock()
+
+    def grab(self, bbox):
+        """Return the region as an (h, w, 4) BGRA view over mss's buffer (no copy)."""
+        sct = getattr(self.local, "sct", None)
+        if sct is None:
+            sct = mss.mss()
+            self.local.sct = sct
+            with self.lock:
+                self.instances.append(sct)
+
+        monitor = {
+            "top": int(bbox[1]),
+            "left": int(bbox[0]),
+            "width": int(bbox[2] - bbox[0]),
+            "height": int(bbox[3] - bbox[1])
+        }
+        sct_img = sct.grab(monitor)
+        return np.frombuffer(sct_img.raw, dtype=np.uint8).reshape(sct_img.height, sct_img.width, 4)
+
+    def grab_bgr(self, bbox):
+        """Return the region as a contiguous BGR frame, the one conversion per frame."""
+        return cv2.cvtColor(self.grab(bbox), cv2.COLOR_BGRA2BGR)
+
+    def close(self):
+        with self.lock:
+            for sct in self.instances:
+                sct.close()
+            self.instances = []
+
+
+if __name__ == "__main__":
+    # Count bytes allocated per frame by the old PIL capture path and the NumPy
+    # path, on a synthetic grab buffer so this runs without a display.
+    # tracemalloc sees NumPy/OpenCV buffers; Pillow allocates outside of it,
+    # so the size of every PIL image a step creates is added by hand.
+    import tracemalloc
+    import imagehash
+    from PIL import Image
+
+    h, w = 1080, 1920
+    rng = np.random.default_rng(0)
+    raw = bytearray(rng.integers(0, 255, h * w * 4, dtype=np.uint8).tobytes())
+    boxes = [(x, y, x + 60, y + 200) for x in range(100, 1800, 150) for y in (100, 500)]
+
+    def pil_bytes(img):
+        return img.size[0] * img.size[1] * len(img.getbands())
+
+    def legacy_steps(st):
+        def capture():
+            # mss .rgb builds a new RGB bytes object, then PIL copies it
+            rgb = np.frombuffer(raw, dtype=np.uint8).reshape(h, w, 4)[:, :, 2::-1].tobytes()
+            st["image"] = Image.frombytes("RGB", (w, h), rgb)
+            return pil_bytes(st["image"])
+        def submit_copy():
+            st["image"] = st["image"].copy()
+            return pil_bytes(st["image"])
+        def run_phash():
+            imagehash.phash(st["image"])
+            return w * h  # grayscale copy inside phash
+        def to_rgb():
+            st["pil"] = st["image"].convert("RGB")
+            return pil_bytes(st["pil"])
+        def frame_phash():
+            imagehash.phash(st["pil"])
+            return w * h
+        def to_bgr():
+            st["frame"] = cv2.cvtColor(np.array(st["pil"]), cv2.COLOR_RGB2BGR)
+        def detect_convert():
+            cv2.cvtColor(np.array(st["frame"]), cv2.COLOR_RGB2BGR)
+        def crop_convert():
+            st["image_cv"] = cv2.cvtColor(np.array(st["frame"]), cv2.COLOR_RGB2BGR)
+        def crops():
+            extra = 0
+            for x1, y1, x2, y2 in boxes:
+                pil = Image.fromarray(cv2.cvtColor(st["image_cv"][y1:y2, x1:x2], cv2.COLOR_BGR2RGB))
+                np.array(pil.convert("RGB"))  # EasyOCR input
+                extra += 2 * pil_bytes(pil)
+            return extra
+        return [capture, submit_copy, run_phash, to_rgb, frame_phash, to_bgr,
+                detect_convert, crop_convert, crops]
+
+    def new_steps(st):
+        def capture():
+            bgra = np.frombuffer(raw, dtype=np.uint8).reshape(h, w, 4)
+            st["frame"] = cv2.cvtColor(bgra, cv2.COLOR_BGRA2BGR)
+        def gray():
+            st["gray"] = cv2.cvtColor(st["frame"], cv2.COLOR_BGR2GRAY)
+        def phash():
+            small = cv2.resize(st["gray"], (32, 32), interpolation=cv2.INTER_AREA)
+            cv2.dct(small.astype(np.float32))
+        def crops():
+            for x1, y1, x2, y2 in boxes:
+                st["frame"][y1:y2, x1:x2]  # views; EasyOCR takes the BGR crop as is
+        return [capture, gray, phash, crops]
+
+    def measure(make_steps):
+        st = {}
+        steps = make_steps(st)
+        total = 0
+        tracemalloc.start()
+        for step in steps:
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            untraced = step() or 0
+            _, peak = tracemalloc.get_traced_memory()
+            total += (peak - before) + untraced
+        tracemalloc.stop()
+        return total, len(steps)
+
+    for name, make_steps in (("legacy", legacy_steps), ("numpy", new_steps)):
+        measure(make_steps)  # warm-up
+        total, n_steps = measure(make_steps)
+        print(f"[Alloc] {name:>6}: {total / 1e6:6.1f} MB allocated per {w}x{h} frame "
+              f"({total / (h * w * 3):.1f}x a BGR frame, {n_steps} stages)")
@@ -0,0 +1,155 @@
+import itertools
+import cv2
+import numpy as np
+from OCRCache import OCRCache, same_text
+
+
+class ScrollTracker:
+    """
+    Follows text through scrolling.
+
+    estimate() measures the global translation between the previous and the
+    current frame with phase correlation on a downscaled copy, refines it
+    to whole pixels on a full-resolution patch, and only accepts it if it
+    actually explains the frame (the shifted difference must be well below
+    the unshifted one). Tracked text boxes are moved along with the content
+    and matched to the new frame's boxes by IoU, so a line that merely moved
+    keeps its id and its OCR text. Text is only handed back if the crop is
+    verified the way OCRCache verifies a hit: key within `max_key_distance`
+    bits and a matching thumbnail. A box whose text changed in place (a
+    dialogue box advancing, a counter ticking by one digit) is OCR'd again.
+    """
+
+    def __init__(self, small_long_side=512, patch_size=256, min_response=0.1, iou_threshold=0.85,
+                 max_key_distance=OCRCache.MAX_DISTANCE):
+        self.small_long_side = small_long_side
+        self.patch_size = patch_size
+        self.min_response = min_response
+        self.iou_threshold = iou_threshold  # high, so a line that grew or shrank gets OCR'd again
+        self.max_key_distance = max_key_distance  # dHash bits, as in OCRCache
+
+        self.prev_gray = None
+        self.prev_small = None
+        self.window = None
+        self.tracks = []  # dicts: {"id", "box": (x, y, w, h), "key", "thumb", "text"}
+        self.ids = itertools.count(1)
+        self.stats = {"frames": 0, "moved": 0, "rejected": 0, "reused": 0, "new": 0}
+
+    def reset(self):
+        self.prev_gray = None
+        self.prev_small = None
+        self.tracks = []
+
+    def estimate(self, gray):
+        """
+        Return the (dx, dy) the content moved by since the last frame, or None.
+
+        Tracks are shifted by the same amount. Call once per processed frame.
+        """
+        self.stats["frames"] += 1
+        prev_gray, prev_small = self.prev_gray, self.prev_small
+        h, w = gray.shape
+        scale = min(1.0, self.small_long_side / max(h, w))
+        small = cv2.resize(gray, (max(1, round(w * scale)), max(1, round(h * scale))),
+                           interpolation=cv2.INTER_AREA).astype(np.float32)
+        self.prev_gray, self.prev_small = gray, small
+        if prev_small is None or prev_small.shape != small.shape:
+            self.tracks = []
+            return None
+
+        if self.window is None or self.window.shape != small.shape:
+            self.window = cv2.createHanningWindow(small.shape[::-1], cv2.CV_32F)
+        (sx, sy), response = cv2.phaseCorrelate(prev_small, small, self.window)
+        dx, dy = round(sx / scale), round(sy / scale)
+        if response < self.min_response or (dx == 0 and dy == 0):
+            return None
+        dx, dy = self._refine(prev_gray, gray, dx, dy)
+        if (dx == 0 and dy == 0) or not self._explains(prev_gray, gray, dx, dy):
+            self.stats["rejected"] += 1
+            return None
+
+        self.stats["moved"] += 1
+        for t in self.tracks:
+            x, y, tw, th = t["box"]
+            t["box"] = (x + dx, y + dy, tw, th)
+        return dx, dy
+
+    def lookup(self, box, key, thumb):
+        """Return the text of the tracked line at `box` (x, y, w, h) with OCRCache key and thumbnail, or None."""
+        track = self._best(box, self.tracks)
+        if track is None or track["key"][0] != key[0] \
+                or (track["key"][1] ^ key[1]).bit_count() > self.max_key_distance \
+                or track["thumb"] is None or thumb is None or not same_text(track["thumb"], thumb):
+            return None
+        self.stats["reused"] += 1
+        return track["text"]
+
+    def update(self, items):
+        """Replace the tracks with this frame's [(box, key, thumb, text), ...], keeping ids of lines that were tracked."""
+        old = list(self.tracks)
+        self.tracks = []
+        for box, key, thumb, text in items:
+            track = self._best(box, old)
+            if track is not None:
+                old.remove(track)
+                track_id = track["id"]
+            else:
+                track_id = next(self.ids)
+                self.stats["new"] += 1
+            self.tracks.append({"id": track_id, "box": tuple(box), "key": key, "thumb": thumb, "text": text})
+
+    def summary(self):
+        s = self.stats
+        return (
+            f"moved {s['moved']}/{s['frames']} frames (rejected {s['rejected']}) "
+            f"| lines: reused={s['reused']} new={s['new']} tracked={len(self.tracks)}"
+        )
+
+    def _best(self, box, tracks):
+        best, best_iou = None, self.iou_threshold
+        for t in tracks:
+            iou = _iou(box, t["box"])
+            if iou >= best_iou:
+                best, best_iou = t, iou
+        return best
+
+    def _refine(self, prev_gray, gray, dx, dy):
+        # The downscaled estimate can be off by a pixel or two at full
+        # resolution; correlate a full-resolution patch around the centre of
+        # the overlap to land on the exact shift
+        h, w = gray.shape
+        p = self.patch_size
+        cx, cy = w // 2, h // 2
+        x1, y1 = max(0, -dx, cx - p // 2), max(0, -dy, cy - p // 2)
+        x2, y2 = min(w, w - dx, x1 + p), min(h, h - dy, y1 + p)
+        if x2 - x1 < 32 or y2 - y1 < 32:
+            return dx, dy
+        before = prev_gray[y1:y2, x1:x2].astype(np.float32)
+        after = gray[y1 + dy:y2 + dy, x1 + dx:x2 + dx].astype(np.float32)
+        (rx, ry), response = cv2.phaseCorrelate(before, after)
+        if response < self.min_response or abs(rx) > 4 or abs(ry) > 4:
+            return dx, dy
+        return dx + round(rx), dy + round(ry)
+
+    def _explains(self, prev_gray, gray, dx, dy, stride=4):
+        # Compare every `stride`-th pixel of the overlap, moved by the shift
+        # and left in place
+        h, w = gray.shape
+        if abs(dx) >= w or abs(dy) >= h:
+            return False
+        a = prev_gray[max(0, -dy):h - max(0, dy):stride, max(0, -dx):w - max(0, dx):stride]
+        b = gray[max(0, dy):h - max(0, -dy):stride, max(0, dx):w - max(0, -dx):stride]
+        shifted = np.mean(cv2.absdiff(a, b))
+        still = np.mean(cv2.absdiff(prev_gray[::stride, ::stride], gray[::stride, ::stride]))
+        return shifted < 0.5 * still
+
+
+def _iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    iw = min(ax + aw, bx + bw) - max(ax, bx)
+    ih = min(ay + ah, by + bh) - max(ay, by)
+    if iw <= 0 or ih <= 0:
+        return 0.0
+    inter = iw * ih
+    return inter / (aw * ah + bw * bh - inter)
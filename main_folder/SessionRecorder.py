@@ -0,0 +1,219 @@
+"""
+Compact recordings of captured frames, for reproducing performance problems.
+
+A session is two files: PATH holds the compressed frames back to back,
+PATH.idx is a fixed-size record per frame (offset, length, timestamp, the
+ScreenSelector bbox, shape, keyframe). Every `keyframe_interval` frames (and
+whenever the capture size changes) a frame is stored whole; the others
+store the XOR with the frame before, which is almost all zeros for a
+mostly static screen and compresses to a few KB. Both are zlib at a low
+level, on a writer thread, so capture never waits for compression.
+
+    python SessionRecorder.py info session.rtrec
+    python SessionRecorder.py extract session.rtrec frames_dir [--every N]
+
+SessionReader maps PATH and decodes any frame from its keyframe onwards, so
+random access costs at most one keyframe interval of deltas. ReplayHarness
+accepts a session as its FRAMES source.
+"""
+import mmap
+import os
+import queue
+import threading
+import zlib
+import numpy as np
+
+MAGIC = b"RTREC1\0\0"
+INDEX_DTYPE = np.dtype([
+    ("offset", "<u8"), ("length", "<u4"), ("timestamp", "<f8"), ("keyframe", "<u4"),
+    ("bbox", "<i4", 4), ("shape", "<u2", 3), ("is_key", "u1"),
+])
+
+
+class SessionRecorder:
+    def __init__(self, path, keyframe_interval=30, level=1, max_queue=8):
+        self.path = path
+        self.keyframe_interval = keyframe_interval
+        self.level = level
+
+        self.data = open(path, "wb")
+        self.data.write(MAGIC)
+        self.index = open(path + ".idx", "wb")
+        self.index.write(MAGIC)
+        self.offset = len(MAGIC)
+
+        self.count = 0
+        self.prev = None
+        self.keyframe = 0
+        # Frames wait here for the writer; if it falls behind, new frames are dropped
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.stats = {"frames": 0, "keyframes": 0, "dropped": 0, "raw_bytes": 0, "stored_bytes": 0}
+        self.writer = threading.Thread(target=self._write_loop, name="SessionRecorder", daemon=True)
+        self.writer.start()
+
+    def add(self, image, timestamp, bbox):
+        """Queue a BGR frame; `image` must not be modified afterwards (ScreenGrabber frames never are)."""
+        try:
+            self.queue.put_nowait((image, timestamp, bbox))
+        except queue.Full:
+            self.stats["dropped"] += 1
+
+    def summary(self):
+        s = self.stats
+        ratio = s["raw_bytes"] / s["stored_bytes"] if s["stored_bytes"] else 0.0
+        return (
+            f"{s['frames']} frames ({s['keyframes']} key, {s['dropped']} dropped) "
+            f"| {s['stored_bytes'] / 1e6:.1f} MB stored, {ratio:.0f}x smaller than raw"
+        )
+
+    def close(self):
+        self.queue.put(None)
+        self.writer.join()
+        self.data.close()
+        self.index.close()
+        print("[SessionRecorder]", self.path, self.summary())
+
+    def _write_loop(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            try:
+                self._write(*item)
+            except Exception as e:
+                print("[SessionRecorder] Failed to write frame:", e)
+
+    def _write(self, image, timestamp, bbox):
+        image = np.ascontiguousarray(image)
+        if image.ndim == 2:
+            image = image[:, :, None]
+        is_key = (self.prev is None or self.prev.shape != image.shape
+                  or self.count - self.keyframe >= self.keyframe_interval)
+        if is_key:
+            self.keyframe = self.count
+            payload = zlib.compress(image, self.level)
+        else:
+            payload = zlib.compress(np.bitwise_xor(self.prev, image), self.level)
+        self.prev = image
+
+        entry = np.zeros(1, dtype=INDEX_DTYPE)
+        entry["offset"] = self.offset
+        entry["length"] = len(payload)
+        entry["timestamp"] = timestamp
+        entry["keyframe"] = self.keyframe
+        entry["bbox"] = bbox
+        entry["shape"] = image.shape
+        entry["is_key"] = is_key
+        self.data.write(payload)
+        self.index.write(entry.tobytes())
+        self.offset += len(payload)
+        self.count += 1
+        # Keep what was written readable if the app is killed mid-session
+        if is_key:
+            self.data.flush()
+            self.index.flush()
+
+        s = self.stats
+        s["frames"] += 1
+        s["keyframes"] += is_key
+        s["raw_bytes"] += image.nbytes
+        s["stored_bytes"] += len(payload) + INDEX_DTYPE.itemsize
+
+
+class SessionReader:
+    """Random access to the frames of a recorded session; `reader[i]` is frame i as a BGR array."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path + ".idx", "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path}.idx is not a recorded session index")
+            index = np.frombuffer(f.read(), dtype=np.uint8)
+        # A recording cut short may end in a partial record
+        usable = len(index) // INDEX_DTYPE.itemsize * INDEX_DTYPE.itemsize
+        self.index = index[:usable].view(INDEX_DTYPE)
+
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.data[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a recorded session")
+        # Drop records whose payload never made it to disk
+        self.index = self.index[self.index["offset"] + self.index["length"] <= len(self.data)]
+        self.last = None  # (i, frame): sequential reads only apply one delta
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        key = int(self.index[i]["keyframe"])
+        if self.last is not None and key <= self.last[0] <= i:
+            start, frame = self.last[0] + 1, self.last[1]
+        else:
+            start, frame = key + 1, self._payload(key)
+        for j in range(start, i + 1):
+            frame = np.bitwise_xor(frame, self._payload(j))
+        self.last = (i, frame)
+        return frame.copy()
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def timestamp(self, i):
+        return float(self.index[i]["timestamp"])
+
+    def bbox(self, i):
+        return tuple(int(v) for v in self.index[i]["bbox"])
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def _payload(self, i):
+        entry = self.index[i]
+        start = int(entry["offset"])
+        raw = zlib.decompress(self.data[start:start + int(entry["length"])])
+        return np.frombuffer(raw, dtype=np.uint8).reshape(entry["shape"])
+
+
+def is_session(path):
+    return os.path.isfile(path) and os.path.isfile(path + ".idx")
+
+
+if __name__ == "__main__":
+    import argparse
+    import cv2
+
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="command", required=True)
+    info = sub.add_parser("info")
+    info.add_argument("session")
+    extract = sub.add_parser("extract", help="write frames as PNGs, e.g. as ReplayHarness input")
+    extract.add_argument("session")
+    extract.add_argument("out_dir")
+    extract.add_argument("--every", type=int, default=1, help="keep every Nth frame")
+    args = parser.parse_args()
+
+    reader = SessionReader(args.session)
+    if args.command == "info":
+        idx = reader.index
+        n = len(idx)
+        duration = reader.timestamp(n - 1) - reader.timestamp(0) if n else 0.0
+        raw = sum(int(np.prod(s)) for s in idx["shape"])
+        stored = os.path.getsize(args.session) + os.path.getsize(args.session + ".idx")
+        print(f"[Session] {n} frames over {duration:.1f}s, {int(idx['is_key'].sum())} keyframes")
+        print(f"[Session] {stored / 1e6:.1f} MB on disk, {raw / max(stored, 1):.0f}x smaller than raw")
+        if n:
+            print(f"[Session] first bbox {reader.bbox(0)}, last bbox {reader.bbox(n - 1)}")
+    else:
+        os.makedirs(args.out_dir, exist_ok=True)
+        written = 0
+        for i in range(0, len(reader), args.every):
+            cv2.imwrite(os.path.join(args.out_dir, f"frame_{i:06d}.png"), reader[i])
+            written += 1
+        print(f"[Session] Wrote {written} frames to {args.out_dir}")
+    reader.close()
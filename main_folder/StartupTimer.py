@@ -0,0 +1,36 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Import this module first so the clock starts as close to launch as possible
+_start = time.perf_counter()
+_phases = []  # (name, thread name, start offset, seconds)
+_lock = threading.Lock()
+
+
+@contextmanager
+def phase(name):
+    """Time a startup phase; phases may run on any thread and overlap."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        with _lock:
+            _phases.append((name, threading.current_thread().name, start - _start, end - start))
+
+
+def mark(name):
+    """Record an instant (e.g. "window shown") as a zero-length phase."""
+    with _lock:
+        _phases.append((name, threading.current_thread().name, time.perf_counter() - _start, 0.0))
+
+
+def report(title="Startup"):
+    with _lock:
+        phases = sorted(_phases, key=lambda p: p[2])
+    lines = [f"[{title}] {time.perf_counter() - _start:.2f}s since launch"]
+    for name, thread, offset, seconds in phases:
+        took = f"{seconds * 1000:8.0f} ms" if seconds else "       --   "
+        lines.append(f"  +{offset:6.2f}s {took}  {name} ({thread})")
+    print("\n".join(lines), flush=True)
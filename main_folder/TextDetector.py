@@ -0,0 +1,263 @@
+import os
+from abc import ABC, abstractmethod
+import cv2
+import numpy as np
+
+TORCH = "torch"
+ONNX = "onnx"
+DEFAULT_ONNX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "craft.onnx")
+
+
+class TextDetector(ABC):
+    """
+    CRAFT text detection with a pluggable inference backend.
+
+    Pre- and post-processing match craft_text_detector.get_prediction, so
+    every backend returns the same 4-point boxes in image coordinates.
+    Subclasses must implement _forward(), which maps a normalized
+    (1, 3, H, W) float32 batch to the text and link score maps. The polygon
+    refinement and heatmap images get_prediction also builds are skipped,
+    nothing here uses them.
+    """
+
+    name = None
+
+    def __init__(self, text_threshold=0.7, link_threshold=0.4, low_text=0.4):
+        self.text_threshold = text_threshold
+        self.link_threshold = link_threshold
+        self.low_text = low_text
+
+    def detect(self, image, long_size):
+        """Return CRAFT boxes (4x2 arrays) for a BGR image, inferred with its long side at `long_size`."""
+        from craft_text_detector import image_utils, craft_utils
+
+        # CRAFT expects RGB; a reversed-channel view avoids converting the whole frame
+        resized, target_ratio, _ = image_utils.resize_aspect_ratio(
+            image[:, :, ::-1], long_size, interpolation=cv2.INTER_LINEAR
+        )
+        x = image_utils.normalizeMeanVariance(resized).transpose(2, 0, 1)[None]
+        score_text, score_link = self._forward(np.ascontiguousarray(x))
+
+        boxes, _ = craft_utils.getDetBoxes(
+            score_text, score_link, self.text_threshold, self.link_threshold, self.low_text, poly=False
+        )
+        # Score maps are at half the network input's resolution
+        scale = 2 / target_ratio
+        return [np.asarray(box) * scale for box in boxes if box is not None]
+
+    @abstractmethod
+    def _forward(self, x):
+        """Return the (text, link) score maps for a normalized (1, 3, H, W) float32 batch."""
+
+
+class TorchCraftDetector(TextDetector):
+    """The craft_text_detector PyTorch models (CPU or CUDA)."""
+
+    name = TORCH
+
+    def __init__(self, cuda=False, **thresholds):
+        super().__init__(**thresholds)
+        import torch
+        from craft_text_detector import Craft
+        self.torch = torch
+        self.cuda = cuda
+        craft = Craft(output_dir=None, crop_type="box", cuda=cuda)
+        self.craft_net = craft.craft_net
+        self.refine_net = craft.refine_net
+
+    def _forward(self, x):
+        x = self.torch.from_numpy(x)
+        if self.cuda:
+            x = x.cuda()
+        with self.torch.inference_mode():
+            y, feature = self.craft_net(x)
+            score_link = y[0, :, :, 1]
+            if self.refine_net is not None:
+                score_link = self.refine_net(y, feature)[0, :, :, 0]
+        return y[0, :, :, 0].cpu().numpy(), score_link.cpu().numpy()
+
+
+class OnnxCraftDetector(TextDetector):
+    """
+    CRAFT (with its link refiner) exported to ONNX and run on ONNX Runtime's
+    CPU provider. `intra_op_threads` 0 lets ONNX Runtime pick.
+    """
+
+    name = ONNX
+
+    def __init__(self, model_path=DEFAULT_ONNX_PATH, intra_op_threads=0, **thresholds):
+        super().__init__(**thresholds)
+        import onnxruntime as ort
+        if not os.path.exists(model_path):
+            print(f"[TextDetector] {model_path} not found, exporting CRAFT from PyTorch")
+            export_onnx(model_path)
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def _forward(self, x):
+        score_text, score_link = self.session.run(None, {self.input_name: x})
+        return score_text[0], score_link[0]
+
+
+def make_detector(kind=TORCH, cuda=False, onnx_path=DEFAULT_ONNX_PATH, onnx_threads=0):
+    if kind == TORCH:
+        return TorchCraftDetector(cuda=cuda)
+    if kind == ONNX:
+        return OnnxCraftDetector(onnx_path, intra_op_threads=onnx_threads)
+    raise ValueError(f"Unknown text detector {kind!r}")
+
+
+def export_onnx(path=DEFAULT_ONNX_PATH, quantize=False, opset=17):
+    """Export CRAFT + refiner to ONNX with dynamic height/width, optionally int8 (dynamic) quantized."""
+    import torch
+    from craft_text_detector import Craft
+
+    craft = Craft(output_dir=None, crop_type="box", cuda=False)
+
+    class CraftWithRefiner(torch.nn.Module):
+        def __init__(self, craft_net, refine_net):
+            super().__init__()
+            self.craft_net = craft_net
+            self.refine_net = refine_net
+
+        def forward(self, x):
+            y, feature = self.craft_net(x)
+            return y[:, :, :, 0], self.refine_net(y, feature)[:, :, :, 0]
+
+    model = CraftWithRefiner(craft.craft_net, craft.refine_net).eval()
+    dummy = torch.zeros(1, 3, 736, 1280)
+    fp32_path = path + ".fp32" if quantize else path
+    torch.onnx.export(
+        model, dummy, fp32_path,
+        input_names=["image"], output_names=["score_text", "score_link"],
+        dynamic_axes={"image": {2: "height", 3: "width"},
+                      "score_text": {1: "height", 2: "width"},
+                      "score_link": {1: "height", 2: "width"}},
+        opset_version=opset,
+    )
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantize_dynamic(fp32_path, path, weight_type=QuantType.QUInt8)
+        os.remove(fp32_path)
+    print(f"[TextDetector] Exported {'int8' if quantize else 'fp32'} CRAFT to {path}")
+
+
+def _bounds(boxes):
+    if not boxes:
+        return np.empty((0, 4))
+    pts = np.asarray(boxes, dtype=np.float64).reshape(len(boxes), -1, 2)
+    return np.concatenate([pts.min(axis=1), pts.max(axis=1)], axis=1)
+
+
+def box_iou(a, b):
+    """Pairwise IoU of two (n, 4) / (m, 4) arrays of [x1, y1, x2, y2]."""
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+def match_boxes(ref, other, min_iou=0.5):
+    """Greedy one-to-one matching of two box lists, best IoU first; returns (i, j, iou) triples."""
+    if not ref or not other:
+        return []
+    iou = box_iou(_bounds(ref), _bounds(other))
+    pairs = []
+    used_i, used_j = set(), set()
+    for flat in np.argsort(iou, axis=None)[::-1]:
+        i, j = np.unravel_index(flat, iou.shape)
+        if iou[i, j] < min_iou:
+            break
+        if i in used_i or j in used_j:
+            continue
+        used_i.add(i)
+        used_j.add(j)
+        pairs.append((int(i), int(j), float(iou[i, j])))
+    return pairs
+
+
+if __name__ == "__main__":
+    # Export:   python TextDetector.py export [--quantize] [--onnx craft.onnx]
+    # Compare:  python TextDetector.py compare [--onnx craft.onnx] [--threads N] FRAMES...
+    # FRAMES are full captures: a session recorded with main.py --record or
+    # a directory of screenshots (e.g. SessionRecorder.py extract output).
+    # Single-line crops like ../cropped_images say little about detection.
+    # Parity matches torch and ONNX boxes one-to-one (IoU >= 0.5) and reports
+    # missed/extra boxes and the IoU of matched pairs; latency is the median
+    # detect() time per frame.
+    import argparse
+    import glob
+    import time
+    from SessionRecorder import SessionReader, is_session
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=["export", "compare"])
+    parser.add_argument("frames", nargs="*", help="sessions (.rtrec) or directories of full-frame screenshots")
+    parser.add_argument("--every", type=int, default=10, help="use every Nth frame of a session")
+    parser.add_argument("--onnx", default=DEFAULT_ONNX_PATH)
+    parser.add_argument("--quantize", action="store_true")
+    parser.add_argument("--threads", type=int, default=0)
+    parser.add_argument("--long-size", type=int, default=1280)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_onnx(args.onnx, quantize=args.quantize)
+        raise SystemExit
+    if not args.frames:
+        parser.error("compare needs a recorded session or a directory of screenshots")
+
+    images = []
+    for p in args.frames:
+        if is_session(p):
+            reader = SessionReader(p)
+            images += [reader[i] for i in range(0, len(reader), args.every)]
+            reader.close()
+        elif os.path.isdir(p):
+            images += [cv2.imread(f) for f in sorted(glob.glob(os.path.join(p, "*.png")) + glob.glob(os.path.join(p, "*.jpg")))]
+        else:
+            images.append(cv2.imread(p))
+    images = [img for img in images if img is not None]
+    if not images:
+        parser.error("no frames found")
+    small = sum(img.shape[0] < 100 for img in images)
+    if small:
+        print(f"[Compare] {small} images are under 100 px tall; these look like line crops, not frames")
+    print(f"[Compare] {len(images)} frames, long side {args.long_size}")
+
+    detectors = [TorchCraftDetector(), OnnxCraftDetector(args.onnx, intra_op_threads=args.threads)]
+    results, latency = {}, {}
+    for det in detectors:
+        det.detect(images[0], args.long_size)  # warm-up
+        times = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            results[det.name] = [det.detect(img, args.long_size) for img in images]
+            times.append((time.perf_counter() - start) / len(images))
+        latency[det.name] = np.median(times) * 1000
+
+    ious, counts, differing = [], [0, 0], 0
+    for ref, other in zip(results[TORCH], results[ONNX]):
+        pairs = match_boxes(ref, other)
+        counts[0] += len(ref)
+        counts[1] += len(other)
+        ious += [iou for _, _, iou in pairs]
+        differing += len(pairs) < max(len(ref), len(other))
+    ious = np.array(ious)
+    missed, extra = counts[0] - len(ious), counts[1] - len(ious)
+
+    print(f"[Parity] boxes torch={counts[0]} onnx={counts[1]} | matched {len(ious)}, "
+          f"missed by onnx {missed}, extra in onnx {extra} | frames differing {differing}/{len(images)}")
+    if len(ious):
+        print(f"[Parity] matched IoU mean {ious.mean():.3f}, min {ious.min():.3f}, "
+              f">=0.9 {np.mean(ious >= 0.9):.1%}")
+    for name, ms in latency.items():
+        print(f"[Latency] {name:>5}: {ms:7.1f} ms/frame ({latency[TORCH] / ms:.2f}x torch)")
@@ -0,0 +1,159 @@
+"""
+Local stand-in for the translate endpoint googletrans calls, so the
+TranslateWorker client can be checked without the network.
+
+    python TranslateStubServer.py
+
+runs the checks: connection reuse and latency of the pooled client against
+the old per-call Translator + asyncio.run, the concurrency limit with a
+failing line, the per-request timeout, and lines being handed out as they
+finish instead of after the slowest. Lines containing "FAIL" get a 500,
+lines containing "SLOW" answer after `slow_latency`.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+class TranslateStubServer:
+    def __init__(self, latency=0.05, slow_latency=3.0, port=0):
+        self.latency = latency
+        self.slow_latency = slow_latency
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "active": 0, "max_active": 0}
+        self.connections = set()
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse is visible
+            disable_nagle_algorithm = True  # headers and body go out separately
+
+            def do_GET(self):
+                stub._handle(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.server.daemon_threads = True
+        self.host = f"127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, name="TranslateStub", daemon=True).start()
+
+    def reset(self):
+        with self.lock:
+            self.stats = {"requests": 0, "active": 0, "max_active": 0}
+            self.connections = set()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _handle(self, request):
+        query = parse_qs(urlparse(request.path).query).get("q", [""])[0]
+        with self.lock:
+            self.stats["requests"] += 1
+            self.stats["active"] += 1
+            self.stats["max_active"] = max(self.stats["max_active"], self.stats["active"])
+            self.connections.add(request.client_address)
+        try:
+            time.sleep(self.slow_latency if "SLOW" in query else self.latency)
+            if "FAIL" in query:
+                status, body = 500, b""
+            else:
+                # The parts of the reply googletrans reads: segments, then the source language
+                status = 200
+                body = json.dumps([[[f"[en] {query}", query, None, None, 10]], None, "ja"]).encode("utf-8")
+            request.send_response(status)
+            request.send_header("Content-Type", "application/json; charset=utf-8")
+            request.send_header("Content-Length", str(len(body)))
+            request.end_headers()
+            request.wfile.write(body)
+        finally:
+            with self.lock:
+                self.stats["active"] -= 1
+
+
+def point_googletrans_at(host):
+    """Send googletrans's requests to `host` over plain HTTP."""
+    from googletrans import urls, client
+    urls.TRANSLATE = "http://{host}/translate_a/single"
+    original = client.Translator.__init__
+
+    def init(self, *args, **kwargs):
+        original(self, *args, **kwargs)
+        self.service_urls = [host]
+        self.client_type = "gtx"  # no token round trip
+
+    client.Translator.__init__ = init
+
+
+if __name__ == "__main__":
+    import asyncio
+    from googletrans import Translator
+
+    stub = TranslateStubServer(latency=0.05)
+    point_googletrans_at(stub.host)
+    from TranslateWorker import TranslateWorker
+    from TranslationBackend import GoogleBackend
+
+    lines = [f"テスト{i}の行です" for i in range(12)]
+
+    # 1) Sequential requests: the old way builds a client and a loop per call
+    def per_call(txt):
+        async def _do_one():
+            t = Translator(service_urls=['translate.googleapis.com'])
+            return await t.translate(txt, src="ja", dest="en")
+        return asyncio.run(_do_one())
+
+    start = time.perf_counter()
+    for txt in lines:
+        per_call(txt)
+    old = time.perf_counter() - start
+    old_connections = len(stub.connections)
+    stub.reset()
+
+    backend = GoogleBackend(concurrency=4, request_timeout=1.0)
+    worker = TranslateWorker(backend=backend)
+    start = time.perf_counter()
+    for txt in lines:
+        worker.translate_lines([txt])
+    new = time.perf_counter() - start
+    print(f"[Check] {len(lines)} sequential requests: per-call client {old * 1000:.0f} ms, "
+          f"{old_connections} connections | pooled {new * 1000:.0f} ms, {len(stub.connections)} connections")
+    assert len(stub.connections) == 1, stub.connections
+
+    # 2) A failing line only fails itself; lines go out concurrently, within the limit
+    stub.reset()
+    batch = lines + ["FAILする行"]
+    start = time.perf_counter()
+    result = worker.translate_lines(batch)
+    took = time.perf_counter() - start
+    print(f"[Check] {len(batch)} lines with a failing one: {took * 1000:.0f} ms "
+          f"(serially ~{len(batch) * stub.latency * 1000:.0f} ms), "
+          f"max {stub.stats['max_active']} requests at once (limit {backend.concurrency})")
+    assert stub.stats["max_active"] <= backend.concurrency
+    assert result["FAILする行"] == "Translation Error"
+    assert all(result[txt] == f"[en] {txt}" for txt in lines)
+
+    # 3) A line that doesn't answer in time is an error, not a stall
+    start = time.perf_counter()
+    result = worker.translate_lines(["SLOWな行", "普通の行"])
+    took = time.perf_counter() - start
+    print(f"[Check] slow line: {took:.2f}s with a {backend.request_timeout:.1f}s timeout -> {result}")
+    assert result["SLOWな行"] == "Translation Error" and result["普通の行"] == "[en] 普通の行"
+    assert took < stub.slow_latency
+
+    # 4) Lines are handed out as they finish, not after the slowest
+    stub.slow_latency = 0.5
+    start = time.perf_counter()
+    arrivals = [(txt, time.perf_counter() - start) for txt, _ in worker.iter_translations(["SLOWな行"] + lines[:3])]
+    print(f"[Check] streaming: first line after {arrivals[0][1] * 1000:.0f} ms, "
+          f"last ({arrivals[-1][0]}) after {arrivals[-1][1] * 1000:.0f} ms")
+    assert arrivals[-1][0] == "SLOWな行" and arrivals[0][1] < stub.slow_latency / 2
+
+    backend.close()
+    stub.close()
+    print("[Check] all passed")
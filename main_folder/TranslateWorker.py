@@ -1,102 +1,138 @@
 from PyQt5 import QtWidgets, QtCore, QtGui
-from difflib import SequenceMatcher
-import asyncio
-from googletrans import Translator
-translator = Translator()
+import time
+import Metrics
+from TranslationMemory import TranslationMemory, normalize
+from TranslationScheduler import TranslationScheduler
+from TranslationBackend import GoogleBackend
 
 
 class TranslateWorker(QtCore.QThread):
+    # (line ID, JP, EN) as soon as one line is ready; the ID is the normalized JP, stable across OCR jitter
+    line_translated = QtCore.pyqtSignal(str, str, str)
+    # (JP list, EN list) for a whole result; only from translate_texts(), for headless and batch callers
     translated = QtCore.pyqtSignal(list, list)
-    result_ready = QtCore.pyqtSignal(tuple)
 
-    def __init__(self):
+    def __init__(self, memory_path=None, fuzzy_threshold=0.85, backend=None, max_batch=8, max_delay=0.25):
         super().__init__()
-        self.texts = []
-        self.pending = False
+        # Lines of every OCR result, deduped and batched; the ones on screen go first
+        self.scheduler = TranslationScheduler(max_batch=max_batch, max_delay=max_delay)
+        Metrics.gauge("rtocr_queue_depth", "Items waiting or in progress per queue",
+                      self.scheduler.depth, queue="translation")
 
-        self.previous_combined_text = ""
-        self.previous_texts = []
-        self.previous_translated_text = []
+        # Every line translated so far, by normalized JP; persistent with memory_path
+        self.memory = TranslationMemory(db_path=memory_path, fuzzy_threshold=fuzzy_threshold)
+        Metrics.gauge("rtocr_hit_ratio", "Share of lookups served without OCR", self.memory.hit_rate,
+                      cache="translation")
 
         self.force_refresh = False
 
+        # Google by default; see TranslationBackend.py for the local MarianMT one
+        self.backend = backend or GoogleBackend()
+
     def receive_texts(self, texts):
-        self.texts = texts
-        self.pending = True
-
-    def translate_batch(self, jp_list):
-        async def _do_batch():
-            t = Translator(service_urls=['translate.googleapis.com'])
-            # Bulk‐translate in one go:
-            return await t.translate(jp_list, src="ja", dest="en")
-        return asyncio.run(_do_batch())
-
-    def translate_single(self, txt):
-        async def _do_one():
-            t = Translator(service_urls=['translate.googleapis.com'])
-            return await t.translate(txt, src="ja", dest="en")
-        return asyncio.run(_do_one())
-    
+        refresh = self.force_refresh
+        self.force_refresh = False
+        self.scheduler.submit([t for t in texts if t and t.strip()], force=refresh)
+
     def force_translate(self):
         self.force_refresh = True
 
     def run(self):
+        try:
+            self.backend.load()
+        except Exception as e:
+            print("[TranslateWorker] Loading the translation backend failed:", e, flush=True)
         while True:
-            if self.pending:
-                # Build the combined JP block for similarity checking
-                # combined_text = "\n".join(self.texts or [])
-                combined_text = [t for t in self.texts if t.strip()]
-                joined_prev = "\n".join(sorted(self.previous_texts))
-                joined_cur  = "\n".join(sorted(combined_text))
-                print("----- [TextDiff] Comparing Texts -----", flush=True)
-                print("[Previous JP Text]:\n", self.previous_combined_text, flush=True)
-                print("[Current JP Text]:\n", combined_text, flush=True)
-                similarity = SequenceMatcher(None, joined_prev, joined_cur).ratio()
-                print("Similarity:", similarity)
-
-                # If nothing really changed, reuse last translations
-                if similarity >= 0.9 and len(combined_text) <= len(self.previous_combined_text) and not self.force_refresh:
-                    print("[TextDiff] Same text — reusing previous result.", flush=True)
-                    self.translated.emit(self.texts, self.previous_translated_text)
-                    self.pending = False
-                else:
-                    self.force_refresh = False
-                    print("[TextDiff] Different text - translating...")
-                    # Prepare a clean list of strings (no None)
-                    jp_list = [t if t is not None else "" for t in self.texts]
-                    print(*jp_list, sep=", ")
-
-                    try:
-                        batch = self.translate_batch(jp_list)
-                        en_list = [res.text for txt, res in zip(jp_list, batch) if txt.strip()]
-                    except Exception as e:
-                        print("[TranslateWorker] Batch translation failed:", e, flush=True)
-                        en_list = []
-                        for txt in jp_list:
-                            if not txt.strip():
-                                en_list.append("")
-                            else:
-                                try:
-                                    single = self.translate_single(txt)
-                                    en_list.append(single.text)
-                                except Exception as e2:
-                                    print("[TranslateWorker] Single translation failed:", e2, flush=True)
-                                    en_list.append("Translation Error")
-
-                    # Remember & emit
-                    print("[TranslateWorker] Emitting result:", flush=True)
-                    print("JP:", jp_list, flush=True)
-                    print("EN:", en_list, flush=True)
-
-                    self.previous_combined_text   = combined_text
-                    self.previous_texts = combined_text.copy()
-                    self.previous_translated_text = en_list
-                    self.translated.emit(jp_list, en_list)
-                    self.pending = False
-
-            self.msleep(100)
-
+            item = self.scheduler.take()
+            if item is None:
+                print("[Thread] Scheduler closed — exiting TranslateWorker.")
+                self.backend.close()
+                return
+            lines, batch = item
+            try:
+                if lines:
+                    self.check_memory(lines)
+                if batch:
+                    self.translate_new(batch)
+            except Exception as e:
+                print("[TranslateWorker] Translation failed:", e, flush=True)
+            finally:
+                self.scheduler.resolve(batch)
+
+    def check_memory(self, lines):
+        """Emit what the memory knows of (JP, force) lines and queue the rest; forced lines are always queued."""
+        found = self.lookup([jp for jp, force in lines if not force])
+        self.scheduler.enqueue([jp for jp, force in lines if force or jp not in found])
+
+    def translate_texts(self, texts, refresh=False):
+        """Translate one OCR result and emit `translated` with all of it; for callers without the event loop, e.g. the replay harness."""
+        jp_list = [t for t in texts if t and t.strip()]
+        en_list = self.translate_with_memory(jp_list, refresh=refresh)
+        self.translated.emit(jp_list, en_list)
+
+    def translate_with_memory(self, jp_list, refresh=False):
+        """
+        Translations for jp_list in order; only lines the memory doesn't know
+        are sent (all of them with `refresh`). Emits `line_translated` per
+        line as it is ready: memory hits at once, the rest as the backend
+        hands them out.
+        """
+        found = {} if refresh else self.lookup(jp_list)
+        # OCR variants of one line (brackets, spacing, "..." vs "…") are sent once
+        missing = {}
+        for t in jp_list:
+            if t not in found:
+                missing.setdefault(normalize(t), t)
+        fresh = self.translate_new(list(missing.values()))
+        return [found[t] if t in found else fresh[missing[normalize(t)]] for t in jp_list]
+
+    def lookup(self, jp_list):
+        """Translations the memory has for jp_list, each emitted as `line_translated`."""
+        found = self.memory.get_many(jp_list)
+        for jp, en in found.items():
+            self.line_translated.emit(normalize(jp), jp, en)
+        return found
+
+    def translate_new(self, jp_list):
+        """
+        Send distinct lines to the backend, emitting `line_translated` for each
+        as it arrives and storing them in the memory; returns {JP: EN}. Lines
+        of a failed request get "Translation Error".
+        """
+        fresh = {}
+        try:
+            for jp, en in self.iter_translations(jp_list):
+                fresh[jp] = en
+                self.line_translated.emit(normalize(jp), jp, en)
+        except Exception as e:
+            print("[TranslateWorker] Translation failed:", e, flush=True)
+            for jp in jp_list:
+                if jp not in fresh:
+                    fresh[jp] = "Translation Error"
+                    self.line_translated.emit(normalize(jp), jp, fresh[jp])
+        self.memory.put_many({jp: en for jp, en in fresh.items() if en != "Translation Error"})
+        return fresh
+
+    def translate_lines(self, jp_list):
+        """Translate distinct lines; returns {jp: en} once all are done."""
+        return dict(self.iter_translations(jp_list))
+
+    def iter_translations(self, jp_list):
+        """Yield (jp, en) for distinct lines as the backend finishes each; failed lines get "Translation Error"."""
+        if not jp_list:
+            return
+        start = time.perf_counter()
+        for txt, result in self.backend.translate_iter(jp_list):
+            if isinstance(result, Exception):
+                print("[TranslateWorker] Single translation failed:", str(result) or type(result).__name__, flush=True)
+                result = "Translation Error"
+            yield txt, result
+        Metrics.observe_stage("translate", time.perf_counter() - start)
 
     def shutdown_now(self):
         print("[Exit] Shutting down TranslateWorker.")
+        self.scheduler.close()
+        # Let a request that is already out finish, but don't hang the exit on the network
+        self.wait(2000)
+        self.memory.close()
         self.quit()
\ No newline at end of file
@@ -0,0 +1,287 @@
+import asyncio
+import json
+import os
+import time
+from abc import ABC, abstractmethod
+
+GOOGLE = "google"
+MARIAN = "marian"
+STUB = "stub"
+DEFAULT_MARIAN_MODEL = "Helsinki-NLP/opus-mt-ja-en"
+
+
+class TranslationBackend(ABC):
+    """
+    Turns Japanese lines into English.
+
+    translate() takes every line of a request at once and returns the
+    translations in the same order, or raises if the request failed as a
+    whole. translate_each() is the fallback after such a failure: every line
+    on its own, returning a translation or the exception per line.
+    translate_iter() yields (line, translation or exception) as each one is
+    ready; by default all of them once translate() (or the fallback) returns.
+    """
+
+    name = None
+
+    def load(self):
+        """Load whatever translate() needs; called by TranslateWorker's thread before the first request."""
+
+    @abstractmethod
+    def translate(self, jp_list):
+        """Return the translations of jp_list in order, or raise if the request failed."""
+
+    def translate_iter(self, jp_list):
+        try:
+            results = self.translate(jp_list)
+        except Exception as e:
+            print("[TranslationBackend] Batch translation failed:", str(e) or type(e).__name__, flush=True)
+            # Retry line by line, so one bad line doesn't cost the others
+            results = self.translate_each(jp_list)
+        yield from zip(jp_list, results)
+
+    def translate_each(self, jp_list):
+        results = []
+        for txt in jp_list:
+            try:
+                results.append(self.translate([txt])[0])
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def close(self):
+        pass
+
+
+class GoogleBackend(TranslationBackend):
+    """
+    googletrans over the network. One event loop and one Translator (one
+    HTTP connection pool) for the backend's lifetime, created on first use
+    by the thread that translates. googletrans sends a list as one request
+    per line, `concurrency` at a time; translate_iter() and the fallback do
+    the same with a timeout per line, translate_iter() handing each line
+    out as soon as its request is back.
+    """
+
+    name = GOOGLE
+
+    def __init__(self, concurrency=4, request_timeout=5.0):
+        self.concurrency = concurrency
+        self.request_timeout = request_timeout
+        self.loop = None
+        self.client = None
+        self.semaphore = None
+
+    def translate(self, jp_list):
+        rounds = -(-len(jp_list) // self.concurrency)
+        results = self._run(lambda: asyncio.wait_for(
+            self._client().translate(jp_list, src="ja", dest="en"), self.request_timeout * rounds))
+        return [r.text for r in results]
+
+    def translate_each(self, jp_list):
+        results = self._run(lambda: asyncio.gather(
+            *(self._translate_one(txt) for txt in jp_list), return_exceptions=True))
+        return [r if isinstance(r, Exception) else r.text for r in results]
+
+    def translate_iter(self, jp_list):
+        self._run(lambda: asyncio.sleep(0))  # the loop and semaphore exist from here on
+        pending = {self.loop.create_task(self._tagged(txt)) for txt in jp_list}
+        try:
+            while pending:
+                done, pending = self.loop.run_until_complete(
+                    asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED))
+                for task in done:
+                    yield task.result()
+        finally:
+            # Abandoned halfway (e.g. shutdown): don't leave requests running on the loop
+            for task in pending:
+                task.cancel()
+            if pending:
+                self.loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+
+    async def _tagged(self, txt):
+        try:
+            return txt, (await self._translate_one(txt)).text
+        except Exception as e:
+            return txt, e
+
+    async def _translate_one(self, txt):
+        async with self.semaphore:
+            return await asyncio.wait_for(self._client().translate(txt, src="ja", dest="en"), self.request_timeout)
+
+    def _client(self):
+        if self.client is None:
+            from googletrans import Translator
+            # raise_exception: a failed request must not come back as the JP text "translated"
+            self.client = Translator(service_urls=['translate.googleapis.com'], raise_exception=True,
+                                     timeout=self.request_timeout, list_operation_max_concurrency=self.concurrency)
+        return self.client
+
+    def _run(self, make_coro):
+        if self.loop is None:
+            self.loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self.loop)
+            self.semaphore = asyncio.Semaphore(self.concurrency)
+        return self.loop.run_until_complete(make_coro())
+
+    def close(self):
+        """Close the connection pool and the event loop; call from the thread that translated."""
+        if self.loop is None:
+            return
+        if self.client is not None:
+            self.loop.run_until_complete(self.client.client.aclose())
+            self.client = None
+        self.loop.close()
+        self.loop = None
+
+
+class MarianBackend(TranslationBackend):
+    """
+    MarianMT (opus-mt-ja-en by default) on the CPU, no network.
+
+    All lines of a request go through one padded generate() call.
+    `quantize` converts the Linear layers to int8 with dynamic
+    quantization; `num_beams` 1 is greedy decoding; `threads` sets torch's
+    intra-op threads (process-wide, 0 leaves torch's default). `model` and
+    `tokenizer` can be passed in instead of loading `model_name`, which
+    otherwise happens in load(), off the GUI thread.
+    """
+
+    name = MARIAN
+
+    def __init__(self, model_name=DEFAULT_MARIAN_MODEL, quantize=True, num_beams=1, threads=0, max_new_tokens=128,
+                 model=None, tokenizer=None):
+        self.model_name = model_name
+        self.quantize = quantize
+        self.num_beams = num_beams
+        self.threads = threads
+        self.max_new_tokens = max_new_tokens
+        self.model = model
+        self.tokenizer = tokenizer
+        self.torch = None
+
+    def load(self):
+        if self.torch is not None:
+            return
+        start = time.perf_counter()
+        import torch
+        from transformers import MarianMTModel, MarianTokenizer
+        if self.threads:
+            torch.set_num_threads(self.threads)
+        self.tokenizer = self.tokenizer or MarianTokenizer.from_pretrained(self.model_name)
+        model = (self.model or MarianMTModel.from_pretrained(self.model_name)).eval()
+        if self.quantize:
+            model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.model = model
+        self.torch = torch
+        print(f"[Marian] {self.model_name} ready ({'int8' if self.quantize else 'fp32'}, "
+              f"beams={self.num_beams}) in {time.perf_counter() - start:.1f}s")
+
+    def translate(self, jp_list):
+        self.load()
+        inputs = self.tokenizer(jp_list, return_tensors="pt", padding=True, truncation=True)
+        with self.torch.inference_mode():
+            output = self.model.generate(**inputs, num_beams=self.num_beams, do_sample=False,
+                                         max_new_tokens=self.max_new_tokens)
+        return self.tokenizer.batch_decode(output, skip_special_tokens=True)
+
+
+class StubBackend(TranslationBackend):
+    """Tags each line instead of translating it; for replays and offline checks."""
+
+    name = STUB
+
+    def __init__(self, latency=0.0, line_latency=0.0):
+        self.latency = latency
+        self.line_latency = line_latency
+        self.sent = 0
+
+    def translate(self, jp_list):
+        self.sent += len(jp_list)
+        time.sleep(self.latency + self.line_latency * len(jp_list))
+        return [f"[en] {jp}" for jp in jp_list]
+
+
+def make_backend(kind=GOOGLE, **options):
+    if kind == GOOGLE:
+        return GoogleBackend(**options)
+    if kind == MARIAN:
+        return MarianBackend(**options)
+    if kind == STUB:
+        return StubBackend(**options)
+    raise ValueError(f"Unknown translation backend {kind!r}")
+
+
+def tiny_marian(workdir, corpus=None, d_model=16, layers=1, seed=0):
+    """
+    A randomly initialized MarianMT with a character-level vocabulary built
+    from `corpus`, as (model, tokenizer). Its output is noise, but it runs
+    the exact MarianBackend code path offline and in milliseconds.
+    """
+    import sentencepiece as spm
+    import torch
+    from transformers import MarianConfig, MarianMTModel, MarianTokenizer
+
+    lines = corpus or ["今日はとても暑いですね。", "おはようございます！", "なにをしているの？",
+                       "The weather is nice today.", "Good morning!", "What are you doing?"]
+    os.makedirs(workdir, exist_ok=True)
+    prefix = os.path.join(workdir, "spm")
+    spm.SentencePieceTrainer.train(
+        sentence_iterator=iter(lines), model_prefix=prefix, model_type="char", vocab_size=len(set("".join(lines))),
+        hard_vocab_limit=False, character_coverage=1.0, bos_id=-1, eos_id=-1, unk_id=0, minloglevel=2,
+    )
+    sp = spm.SentencePieceProcessor(model_file=prefix + ".model")
+    pieces = ["</s>", "<unk>", "<pad>"] + [sp.id_to_piece(i) for i in range(1, sp.get_piece_size())]
+    vocab_path = os.path.join(workdir, "vocab.json")
+    with open(vocab_path, "w", encoding="utf-8") as f:
+        json.dump({p: i for i, p in enumerate(pieces)}, f, ensure_ascii=False)
+    tokenizer = MarianTokenizer(prefix + ".model", prefix + ".model", vocab_path)
+
+    config = MarianConfig(
+        vocab_size=len(tokenizer), d_model=d_model, encoder_layers=layers, decoder_layers=layers,
+        encoder_attention_heads=2, decoder_attention_heads=2, encoder_ffn_dim=2 * d_model,
+        decoder_ffn_dim=2 * d_model, max_position_embeddings=256, pad_token_id=tokenizer.pad_token_id,
+        eos_token_id=tokenizer.eos_token_id, decoder_start_token_id=tokenizer.pad_token_id,
+        forced_eos_token_id=tokenizer.eos_token_id,
+    )
+    torch.manual_seed(seed)
+    return MarianMTModel(config), tokenizer
+
+
+if __name__ == "__main__":
+    # Latency of MarianMT per frame-sized batch, fp32 vs int8 and greedy vs beam:
+    #   python TranslationBackend.py [--model Helsinki-NLP/opus-mt-ja-en] [--threads N]
+    #   python TranslationBackend.py --tiny     (random tiny model, no download)
+    import argparse
+    import tempfile
+    import numpy as np
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default=DEFAULT_MARIAN_MODEL)
+    parser.add_argument("--tiny", action="store_true", help="use a randomly initialized tiny model")
+    parser.add_argument("--threads", type=int, default=0)
+    parser.add_argument("--lines", type=int, default=8, help="lines per batch (one frame)")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    sample = ["今日はとても暑いですね。", "おはようございます！", "なにをしているの？", "ちょっと待って…",
+              "これは何ですか", "もう帰ろうよ", "本当にありがとう", "また明日ね"]
+    batch = (sample * (args.lines // len(sample) + 1))[:args.lines]
+
+    for quantize in (False, True):
+        for beams in (1, 4):
+            if args.tiny:
+                model, tokenizer = tiny_marian(tempfile.mkdtemp())
+            else:
+                model = tokenizer = None
+            backend = MarianBackend("tiny" if args.tiny else args.model, quantize=quantize, num_beams=beams,
+                                    threads=args.threads, model=model, tokenizer=tokenizer)
+            backend.translate(batch[:1])  # warm-up
+            times = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                out = backend.translate(batch)
+                times.append(time.perf_counter() - start)
+            assert len(out) == len(batch)
+            print(f"[Marian] {'int8' if quantize else 'fp32'} beams={beams}: "
+                  f"{np.median(times) * 1000:7.1f} ms per {len(batch)}-line batch | {batch[0]} -> {out[0]!r}")
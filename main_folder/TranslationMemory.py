@@ -0,0 +1,142 @@
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from FuzzyLineIndex import FuzzyLineIndex
+
+# Brackets and quotes OCR adds or drops around the same line
+_BRACKETS = re.compile(r"[「」『』【】〔〕〈〉《》()\[\]\"'“”‘’]")
+_ELLIPSIS = re.compile(r"・{2,}|\.{2,}|‥+")
+_REPEATS = re.compile(r"([!?…~。、,.・])\1+")
+
+
+def normalize(text):
+    """
+    Key for a Japanese line: NFKC (full-width ASCII, half-width kana), no
+    whitespace or brackets, every spelling of an ellipsis as "…", repeated
+    punctuation collapsed and trailing full stops dropped. OCR variations of
+    the same line end up with the same key; anything that changes meaning
+    (a ! or ? that is there or not) still gives a different one.
+    """
+    text = unicodedata.normalize("NFKC", text)
+    text = "".join(text.split())
+    text = _BRACKETS.sub("", text)
+    text = _ELLIPSIS.sub("…", text)
+    text = _REPEATS.sub(r"\1", text)
+    return text.rstrip("。.")
+
+
+class TranslationMemory:
+    """
+    Translations per normalized Japanese line: an in-memory LRU in front of
+    SQLite, so a line is translated once and stays translated across
+    restarts. Without `db_path` it only lives as long as the process.
+
+    A line with no exact entry falls back to the closest line in the LRU
+    within `fuzzy_threshold` similarity (see FuzzyLineIndex), so OCR jitter
+    such as a misread kana reuses the translation too. 1.0 turns that off.
+    """
+
+    def __init__(self, max_entries=4096, db_path=None, fuzzy_threshold=0.85):
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # normalized JP -> EN, oldest first
+        self.fuzzy = FuzzyLineIndex(threshold=fuzzy_threshold)
+
+        self.hits = 0
+        self.near_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self.db = None
+        if db_path:
+            self._open_db(db_path)
+
+    def get_many(self, jp_lines):
+        """Return {line: translation} for the lines the memory knows."""
+        found = {}
+        with self.lock:
+            for jp in dict.fromkeys(jp_lines):
+                key = normalize(jp)
+                if key in self.entries:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    found[jp] = self.entries[key]
+                    continue
+                if self.db is not None:
+                    row = self.db.execute(
+                        "SELECT en FROM translation_memory WHERE key = ?", (key,)
+                    ).fetchone()
+                    if row is not None:
+                        self._insert(key, row[0])
+                        self.disk_hits += 1
+                        found[jp] = row[0]
+                        continue
+                near = self.fuzzy.nearest(key)
+                if near is not None:
+                    self.entries.move_to_end(near[0])
+                    self.near_hits += 1
+                    found[jp] = self.entries[near[0]]
+                    continue
+                self.misses += 1
+        return found
+
+    def put_many(self, translations):
+        """Store {line: translation}; one SQLite transaction per batch."""
+        if not translations:
+            return
+        now = time.time()
+        with self.lock:
+            rows = []
+            for jp, en in translations.items():
+                key = normalize(jp)
+                self.entries.pop(key, None)
+                self._insert(key, en)
+                rows.append((key, jp, en, now))
+            if self.db is not None:
+                self.db.executemany(
+                    "INSERT OR REPLACE INTO translation_memory (key, jp, en, last_used) VALUES (?, ?, ?, ?)",
+                    rows,
+                )
+                self.db.commit()
+
+    def hit_rate(self):
+        lookups = self.hits + self.near_hits + self.disk_hits + self.misses
+        return (lookups - self.misses) / lookups if lookups else 0.0
+
+    def summary(self):
+        return (
+            f"{len(self.entries)}/{self.max_entries} lines | hits={self.hits} near={self.near_hits} "
+            f"disk={self.disk_hits} misses={self.misses} | hit rate {self.hit_rate():.0%}"
+        )
+
+    def close(self):
+        with self.lock:
+            if self.db is not None:
+                self.db.close()
+                self.db = None
+
+    def _insert(self, key, en):
+        self.entries[key] = en
+        self.fuzzy.add(key)
+        while len(self.entries) > self.max_entries:
+            old_key, _ = self.entries.popitem(last=False)
+            self.fuzzy.remove(old_key)
+
+    def _open_db(self, db_path):
+        # The translate thread and headless callers share it, access is serialized by self.lock
+        self.db = sqlite3.connect(db_path, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS translation_memory ("
+            "key TEXT PRIMARY KEY, jp TEXT, en TEXT, last_used REAL)"
+        )
+        self.db.commit()
+        rows = self.db.execute(
+            "SELECT key, en FROM translation_memory ORDER BY last_used DESC LIMIT ?",
+            (self.max_entries,),
+        ).fetchall()
+        for key, en in reversed(rows):
+            self._insert(key, en)
+        print(f"[TranslationMemory] Loaded {len(rows)} lines from {db_path}")
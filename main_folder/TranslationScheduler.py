@@ -0,0 +1,284 @@
+import threading
+import time
+from collections import OrderedDict
+import Metrics
+from TranslationMemory import normalize
+
+
+class TranslationScheduler:
+    """
+    Micro-batches translation requests across OCR results, by line.
+
+    Every OCR result is handed to the worker at once to be looked up in the
+    translation memory; lines the memory doesn't know come back through
+    enqueue() and are queued once per normalized line, however many results
+    carry them and whether or not they are already being translated.
+
+    The newest result is what the caption boxes show. Its queued lines
+    don't wait: as soon as the worker is free they go out, at most
+    `max_batch` per request, ahead of everything else, so a long page that
+    was scrolled or flipped away no longer holds up the one on screen. Lines
+    only older results had (the control box history) are sent once nothing
+    on screen is waiting, when `max_batch` of them have piled up or the
+    oldest has waited `max_delay` seconds. Beyond `max_pending` queued lines
+    the oldest history lines are dropped.
+    """
+
+    def __init__(self, max_batch=8, max_delay=0.25, max_pending=256):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+
+        self.cond = threading.Condition()
+        self.unchecked = OrderedDict()  # JP -> force, not looked up in the memory yet
+        self.visible = set()            # normalized JP of the newest result
+        self.pending = OrderedDict()    # normalized JP -> (JP, queued at), oldest first
+        self.in_flight = set()          # normalized JP being translated
+        self.closed = False
+        self.stats = {"results": 0, "queued": 0, "deduped": 0, "dropped": 0, "batches": 0, "sent": 0,
+                      "on_screen": 0}
+
+    def submit(self, lines, force=False):
+        """Hand over an OCR result; it replaces the previous one on screen."""
+        with self.cond:
+            self.visible = {normalize(jp) for jp in lines}
+            for jp in lines:
+                self.unchecked[jp] = force or self.unchecked.pop(jp, False)
+            self.stats["results"] += 1
+            self.cond.notify()
+
+    def take(self):
+        """
+        Block until there is work; returns (lines to look up as (JP, force),
+        batch of JP lines to translate) with one of the two empty, or None
+        once closed.
+        """
+        with self.cond:
+            while not self.closed:
+                if self.unchecked:
+                    lines = list(self.unchecked.items())
+                    self.unchecked.clear()
+                    return lines, []
+                if self.pending:
+                    wait = self._due_in(time.time())
+                    if wait <= 0:
+                        return [], self._pick()
+                    self.cond.wait(wait)
+                else:
+                    self.cond.wait()
+            return None
+
+    def enqueue(self, lines):
+        """Queue lines for translation; lines already queued or being translated are not queued twice."""
+        now = time.time()
+        with self.cond:
+            for jp in lines:
+                key = normalize(jp)
+                if key in self.pending or key in self.in_flight:
+                    self.stats["deduped"] += 1
+                    continue
+                self.pending[key] = (jp, now)
+                self.stats["queued"] += 1
+            while len(self.pending) > self.max_pending:
+                key = next((k for k in self.pending if k not in self.visible), None)
+                if key is None:
+                    break
+                del self.pending[key]
+                self.stats["dropped"] += 1
+            self.cond.notify()
+
+    def resolve(self, lines):
+        """The worker is done with these lines, translated or not."""
+        with self.cond:
+            for jp in lines:
+                self.in_flight.discard(normalize(jp))
+
+    def depth(self):
+        with self.cond:
+            return len(self.unchecked) + len(self.pending) + len(self.in_flight)
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def summary(self):
+        s = self.stats
+        per_batch = s["sent"] / s["batches"] if s["batches"] else 0.0
+        return (
+            f"results={s['results']} | lines queued={s['queued']} deduped={s['deduped']} "
+            f"dropped={s['dropped']} pending={len(self.pending)} | "
+            f"batches={s['batches']} ({per_batch:.1f} lines each, {s['on_screen']} on screen)"
+        )
+
+    def _due_in(self, now):
+        if len(self.pending) >= self.max_batch or not self.visible.isdisjoint(self.pending):
+            return 0.0
+        _, oldest = next(iter(self.pending.values()))
+        return oldest + self.max_delay - now
+
+    def _pick(self):
+        keys = [k for k in self.pending if k in self.visible]
+        on_screen = len(keys)
+        if not keys:
+            keys = list(self.pending)
+        now = time.time()
+        batch = []
+        for key in keys[:self.max_batch]:
+            jp, queued = self.pending.pop(key)
+            self.in_flight.add(key)
+            batch.append(jp)
+            Metrics.observe_stage("translate_wait", now - queued)
+        self.stats["batches"] += 1
+        self.stats["sent"] += len(batch)
+        self.stats["on_screen"] += min(on_screen, len(batch))
+        return batch
+
+
+if __name__ == "__main__":
+    # Benchmark: streams of OCR results through TranslateWorker, with this
+    # scheduler and with the newest-result-wins mailbox it replaced, against
+    # a stub backend shaped like
+    #   google: one round trip per line, `concurrency` lines at a time, each
+    #           handed out as its request is back (GoogleBackend)
+    #   marian: one round trip per request plus a bit per line, all lines
+    #           handed out together (MarianBackend)
+    #   reading:   dialogue (new lines under the last few) and manga pages,
+    #              some skimmed for a few results, some read
+    #   scrolling: a long strip scrolled at varying speed
+    # Reported per run: lines sent, lines per second of backend time, and per
+    # line the time from its first appearance to its caption, for lines
+    # translated while still on screen. "missed" lines left the screen
+    # before their caption arrived.
+    #   python TranslationScheduler.py [--backend marian] [--scenario reading] [--frames 250]
+    import argparse
+    import numpy as np
+    from PyQt5 import QtCore
+    from FrameMailbox import FrameMailbox
+    from TranslateWorker import TranslateWorker
+    from TranslationBackend import StubBackend
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenario", choices=["reading", "scrolling", "both"], default="both")
+    parser.add_argument("--backend", choices=["google", "marian"], default="google")
+    parser.add_argument("--frames", type=int, default=250)
+    parser.add_argument("--interval", type=float, default=0.08, help="seconds between OCR results")
+    parser.add_argument("--round-trip", type=float, default=0.15, help="backend seconds per request")
+    parser.add_argument("--concurrency", type=int, default=4, help="google: requests at a time")
+    parser.add_argument("--per-line", type=float, default=0.02, help="marian: backend seconds per line")
+    parser.add_argument("--max-batch", type=int, default=8)
+    parser.add_argument("--max-delay", type=float, default=0.25)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    kana = [chr(c) for c in range(0x3041, 0x3094)]
+
+    def line():
+        return "".join(rng.choice(kana, rng.integers(6, 20))) + "！"
+
+    def reading():
+        frames, log = [], []
+        while len(frames) < args.frames:
+            for _ in range(rng.integers(10, 30)):
+                log += [line() for _ in range(rng.integers(0, 3))]
+                frames.append(log[-6:])
+            for _ in range(rng.integers(1, 4)):
+                page = [line() for _ in range(rng.integers(8, 30))]
+                frames += [page] * int(rng.choice([3, 5, 30]))
+        return frames[:args.frames]
+
+    def scrolling():
+        strip = [line() for _ in range(args.frames * 4)]
+        frames, top = [], 0
+        for _ in range(args.frames):
+            frames.append(strip[top:top + 20])
+            top += int(rng.choice([0, 0, 0, 1, 2, 4]))
+        return frames
+
+    class PooledStub(StubBackend):
+        def __init__(self, latency, concurrency):
+            super().__init__(latency)
+            self.concurrency = concurrency
+
+        def translate_iter(self, jp_list):
+            for i in range(0, len(jp_list), self.concurrency):
+                chunk = jp_list[i:i + self.concurrency]
+                yield from zip(chunk, self.translate(chunk))
+
+    def run(mode, stream):
+        if args.backend == "google":
+            backend = PooledStub(args.round_trip, args.concurrency)
+        else:
+            backend = StubBackend(latency=args.round_trip, line_latency=args.per_line)
+        worker = TranslateWorker(backend=backend, max_batch=args.max_batch, max_delay=args.max_delay)
+        busy_s = [0.0]
+        original = backend.translate
+
+        def timed(jp_list):
+            start = time.perf_counter()
+            try:
+                return original(jp_list)
+            finally:
+                busy_s[0] += time.perf_counter() - start
+        backend.translate = timed
+
+        first_seen, captioned, missed = {}, {}, set()
+        on_screen = [set()]
+
+        def caption(line_id, jp, en):
+            if line_id in on_screen[0]:
+                captioned.setdefault(line_id, time.time())
+        worker.line_translated.connect(caption, QtCore.Qt.DirectConnection)
+
+        if mode == "mailbox":
+            mailbox = FrameMailbox()
+
+            def consume():
+                while True:
+                    item = mailbox.take()
+                    if item is None:
+                        return
+                    worker.translate_with_memory(item[1])
+                    mailbox.done()
+            consumer = threading.Thread(target=consume)
+            consumer.start()
+            put, busy = (lambda lines: mailbox.put(lines, time.time())), mailbox.in_flight
+        else:
+            worker.start()
+            put, busy = worker.receive_texts, worker.scheduler.depth
+
+        for lines in stream:
+            now = time.time()
+            keys = {normalize(jp) for jp in lines}
+            missed |= {k for k in on_screen[0] - keys if k not in captioned}
+            for key in keys:
+                first_seen.setdefault(key, now)
+            on_screen[0] = keys
+            put(lines)
+            time.sleep(args.interval)
+        deadline = time.time() + 10
+        while busy() and time.time() < deadline:
+            time.sleep(0.01)
+
+        if mode == "mailbox":
+            mailbox.close()
+            consumer.join()
+        else:
+            worker.scheduler.close()
+            worker.wait()
+        worker.memory.close()
+
+        ms = np.array([captioned[k] - first_seen[k] for k in captioned]) * 1000
+        print(f"[Bench] {mode:9s}: {backend.sent:4d}/{len(first_seen)} lines sent "
+              f"({backend.sent / busy_s[0]:5.1f} per backend second) | captioned {len(captioned):4d}, "
+              f"missed {len(missed - captioned.keys()):3d} | p50 {np.median(ms):4.0f} ms, "
+              f"p95 {np.percentile(ms, 95):5.0f} ms after they appeared")
+        return worker
+
+    for name, make in (("reading", reading), ("scrolling", scrolling)):
+        if args.scenario in (name, "both"):
+            stream = make()
+            print(f"[Bench] {name}: {len(stream)} results every {args.interval * 1000:.0f} ms, {args.backend} backend")
+            run("mailbox", stream)
+            worker = run("scheduler", stream)
+            print("[Bench]", worker.scheduler.summary())
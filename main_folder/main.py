@@ -22,7 +22,9 @@ ToDo: Fix bugs:
 
 """
 
+import StartupTimer  # first, so the startup clock starts at launch
 import sys
+import argparse
 from PyQt5 import QtWidgets, QtCore, QtGui
 
 from ScreenSelector import ScreenSelector
@@ -30,7 +32,10 @@ from CaptionOverlay import CaptionOverlay
 from MiniCaptionBox import MiniCaptionBoxManager
 from OCRWorker import OCRWorker
 from TranslateWorker import TranslateWorker
+from TranslationBackend import make_backend, GOOGLE, MARIAN
 from ControlBox import ControlBox
+import Metrics
+StartupTimer.mark("modules imported")
 
 class ExitShortcut(QtCore.QObject):
     def eventFilter(self, obj, event):
@@ -48,7 +53,42 @@ if __name__ == "__main__":
         translate_worker.shutdown_now()
         QtWidgets.QApplication.quit()
 
-    app = QtWidgets.QApplication(sys.argv)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ocr-processes", type=int, default=0,
+                        help="run OCR in this many worker processes (0 = in the GUI process)")
+    parser.add_argument("--detector", choices=["torch", "onnx"], default="torch",
+                        help="text detector backend (onnx = ONNX Runtime on CPU)")
+    parser.add_argument("--onnx-threads", type=int, default=0,
+                        help="intra-op threads for the ONNX detector (0 = ONNX Runtime default)")
+    parser.add_argument("--detect-max-side", type=int, default=None,
+                        help="cap on the long side text detection runs at (default 1280)")
+    parser.add_argument("--no-auto-scale", action="store_true",
+                        help="don't lower the detection scale for large text")
+    parser.add_argument("--fuzzy-threshold", type=float, default=0.85,
+                        help="similarity at which an OCR'd line reuses a stored translation (1.0 = exact only)")
+    parser.add_argument("--translator", choices=["google", "marian"], default="google",
+                        help="translation backend (marian = local MarianMT on the CPU, no network)")
+    parser.add_argument("--marian-model", default="Helsinki-NLP/opus-mt-ja-en",
+                        help="MarianMT model name or path")
+    parser.add_argument("--no-quantize", action="store_true",
+                        help="run MarianMT in fp32 instead of int8 dynamic quantization")
+    parser.add_argument("--beams", type=int, default=1,
+                        help="MarianMT beam width (1 = greedy decoding)")
+    parser.add_argument("--translate-threads", type=int, default=0,
+                        help="torch threads for MarianMT (0 = torch default)")
+    parser.add_argument("--translate-batch", type=int, default=None,
+                        help="most lines per translation request (default 8 with google, 32 with marian)")
+    parser.add_argument("--translate-delay", type=float, default=0.25,
+                        help="seconds a line no longer on screen may wait for others to share its request")
+    parser.add_argument("--record", metavar="PATH",
+                        help="record every captured frame to a session file (see SessionRecorder.py)")
+    parser.add_argument("--verbose", action="store_true",
+                        help="print each component's summary for every processed frame")
+    parser.add_argument("--metrics-port", type=int, default=9464,
+                        help="serve Prometheus metrics on localhost:PORT/metrics (0 = off)")
+    args, qt_args = parser.parse_known_args()
+
+    app = QtWidgets.QApplication(sys.argv[:1] + qt_args)
 
     # Ctrl + ~ exits app
     exit_filter = ExitShortcut()
@@ -64,10 +104,21 @@ if __name__ == "__main__":
 
     overlay.toggle_capture_box_visibility.connect(selector.toggle_visibility)
 
-    ocr_worker = OCRWorker(selector)
+    ocr_worker = OCRWorker(selector, cache_path="ocr_cache.sqlite3", ocr_processes=args.ocr_processes,
+                           detector=args.detector, onnx_threads=args.onnx_threads,
+                           detect_max_side=args.detect_max_side, auto_scale=not args.no_auto_scale,
+                           record_path=args.record, verbose=args.verbose)
     # overlay.force_translate.connect(ocr_worker.force_translate_now)
 
-    translate_worker = TranslateWorker()
+    if args.translator == MARIAN:
+        backend = make_backend(MARIAN, model_name=args.marian_model, quantize=not args.no_quantize,
+                               num_beams=args.beams, threads=args.translate_threads)
+    else:
+        backend = make_backend(GOOGLE)
+    translate_worker = TranslateWorker(memory_path="translation_memory.sqlite3",
+                                       fuzzy_threshold=args.fuzzy_threshold, backend=backend,
+                                       max_batch=args.translate_batch or (32 if args.translator == MARIAN else 8),
+                                       max_delay=args.translate_delay)
 
     mini_manager = MiniCaptionBoxManager()
 
@@ -77,15 +128,22 @@ if __name__ == "__main__":
     control_box.btn3.clicked.connect(ocr_worker.force_capture)
     control_box.btn3.clicked.connect(translate_worker.force_translate)
     control_box.show()
+    StartupTimer.mark("windows shown")
 
     ocr_worker.result_ready.connect(translate_worker.receive_texts)
     # translate_worker.translated.connect(overlay.update_text)
     ocr_worker.mini_coords.connect(mini_manager.on_new_coords)
-    translate_worker.translated.connect(mini_manager.on_new_texts)
-    translate_worker.translated.connect(control_box.show_translations)
+    ocr_worker.result_ready.connect(mini_manager.on_new_texts)
+    translate_worker.line_translated.connect(mini_manager.on_line_translated)
+    translate_worker.line_translated.connect(control_box.show_translation)
+
+    if args.metrics_port:
+        Metrics.start_server(args.metrics_port)
 
     ocr_worker.start()
     translate_worker.start()
+    # Models keep loading in the background; the report prints once they are warm
+    QtCore.QTimer.singleShot(0, lambda: StartupTimer.mark("event loop running"))
 
 
     sys.exit(app.exec_())